@@ -0,0 +1,456 @@
+import ctypes
+import time
+from collections import deque
+
+from scheduler import ManualScheduler, Scheduler
+
+KEY_DOWN = 'down'
+KEY_UP = 'up'
+
+# Slot (índice da tabela de teclas do keymap) de cada evento: scan code, com
+# 0x100 para a variante estendida/numérica. 0 = sem scan code conhecido.
+EXTENDED_SLOT = 0x100
+ALT_GR_SCAN_CODE = 541      # Como a biblioteca keyboard entrega o Alt Gr no Windows
+ALT_GR_SLOT = 0x1FF
+
+# Scan codes (conjunto 1, layout US) do backend simulado
+SIMULATED_SCAN_CODES = {
+    'esc': 1, '-': 12, '=': 13, 'backspace': 14, 'tab': 15, '[': 26, ']': 27, 'enter': 28,
+    'ctrl': 29, 'left ctrl': 29, ';': 39, "'": 40, '`': 41, 'shift': 42, 'left shift': 42, '\\': 43,
+    ',': 51, '.': 52, '/': 53, 'right shift': 54, 'alt': 56, 'left alt': 56, 'space': 57, 'caps lock': 58,
+    'num lock': 69, 'scroll lock': 70, 'f11': 87, 'f12': 88,
+    'right ctrl': EXTENDED_SLOT | 29, 'right alt': EXTENDED_SLOT | 56, 'alt gr': EXTENDED_SLOT | 56,
+    'home': EXTENDED_SLOT | 71, 'up': EXTENDED_SLOT | 72, 'page up': EXTENDED_SLOT | 73,
+    'left': EXTENDED_SLOT | 75, 'right': EXTENDED_SLOT | 77, 'end': EXTENDED_SLOT | 79,
+    'down': EXTENDED_SLOT | 80, 'page down': EXTENDED_SLOT | 81, 'insert': EXTENDED_SLOT | 82,
+    'delete': EXTENDED_SLOT | 83, 'windows': EXTENDED_SLOT | 91, 'left windows': EXTENDED_SLOT | 91,
+    'right windows': EXTENDED_SLOT | 92, 'menu': EXTENDED_SLOT | 93,
+}
+SIMULATED_SCAN_CODES.update((str(digit % 10), 1 + digit) for digit in range(1, 11))
+SIMULATED_SCAN_CODES.update((f'f{n}', 58 + n) for n in range(1, 11))
+for row, first in (('qwertyuiop', 16), ('asdfghjkl', 30), ('zxcvbnm', 44)):
+    SIMULATED_SCAN_CODES.update((char, first + i) for i, char in enumerate(row))
+
+# Tempo máximo (s) para um evento injetado por nós voltar pelo hook
+MARKER_TTL = 1.0
+
+# Quantas marcas à frente procurar quando a primeira não bate (ex: um evento
+# nosso engolido por outro programa no caminho)
+MARKER_LOOKAHEAD = 4
+
+
+class KeyEvent:
+    """Evento de teclado mínimo (mesmos campos usados do keyboard.KeyboardEvent)."""
+    __slots__ = ('event_type', 'name', 'scan_code', 'time')
+
+    def __init__(self, event_type, name, scan_code=None, time=0.0):
+        self.event_type = event_type
+        self.name = name
+        self.scan_code = scan_code
+        self.time = time
+
+    def __repr__(self):
+        return f"KeyEvent({self.event_type!r}, {self.name!r})"
+
+
+class InjectionMarkers:
+    """Tabela dos eventos injetados por nós que ainda vão voltar pelo hook.
+
+    Os eventos injetados voltam na ordem em que foram enviados, então basta
+    uma fila de marcas (código por evento, com o prazo para voltar). A thread
+    que injeta só acrescenta no fim; só a thread do hook tira, e sempre do
+    começo: consome a marca do evento e descarta as vencidas. Assim uma marca
+    acrescentada enquanto o hook limpa a fila nunca se perde, sem lock.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.pending = deque()
+
+    def add(self, codes):
+        expires = self.clock() + MARKER_TTL
+        # Lista pronta: o extend acrescenta o lote inteiro de uma vez
+        self.pending.extend([(code, expires) for code in codes])
+
+    def consume(self, code):
+        """True se o evento é um dos nossos (e consome a marca dele)."""
+        pending = self.pending
+        if pending[0][0] == code:
+            pending.popleft()
+            return True
+        # Marcas que nunca voltaram (ex: um evento nosso engolido por outro
+        # programa no caminho): só as vencidas saem, do começo da fila
+        now = self.clock()
+        while pending and pending[0][1] < now:
+            pending.popleft()
+        for i in range(min(len(pending), MARKER_LOOKAHEAD)):
+            if pending[i][0] == code:
+                for _ in range(i + 1):
+                    pending.popleft()
+                return True
+        return False
+
+
+class InputBackend:
+    """Interface entre o KeyboardHandler e o sistema de entrada.
+
+    Cobre registro de hooks (com supressão), injeção de eventos e relógio.
+    Um callback de hook recebe o evento (com `name` sempre em minúsculas) e
+    retorna True para deixar passar ou False para suprimir. `scheduler` agenda timeouts no relógio do backend.
+    Eventos injetados pelo próprio backend passam direto, sem chegar ao callback
+    (`filter_injected = False` desliga isso, para comparação nos benchmarks).
+    """
+    KEY_DOWN = KEY_DOWN
+    KEY_UP = KEY_UP
+    scheduler = None
+    markers = None
+    filter_injected = True
+    resolves_slots = False      # True se `key_slots`/`event_slot` sabem os scan codes das teclas
+    shared_slots = frozenset()  # Slots onde teclas diferentes se confundem (o keymap os consulta pelo nome)
+
+    def hook(self, callback):
+        """Registra um hook supressor global. Retorna um handle para unhook."""
+        raise NotImplementedError
+
+    def unhook(self, handle):
+        raise NotImplementedError
+
+    def send(self, key):
+        """Injeta press + release da tecla (ou combinação "ctrl+b")."""
+        raise NotImplementedError
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def release(self, key):
+        raise NotImplementedError
+
+    def compile_batch(self, items):
+        """Resolve itens ('key', nome, down) / ('text', texto) em um lote pronto para `inject`.
+
+        Chamado uma vez, na compilação do perfil. Levanta ValueError para teclas desconhecidas.
+        """
+        raise NotImplementedError
+
+    def inject(self, batch):
+        """Envia um lote compilado em uma única chamada de injeção."""
+        raise NotImplementedError
+
+    def now(self):
+        """Relógio monotônico em segundos."""
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def key_slots(self, name):
+        """Slots da tecla com esse nome (na compilação do keymap), ou () se desconhecida."""
+        return ()
+
+    def event_slot(self, event):
+        """Slot do evento (no hook). Sem trabalho com strings; NO_SLOT (0) se não houver."""
+        return 0
+
+    def _skip_own_events(self, callback):
+        """Envolve um callback de hook para que os eventos injetados por nós passem direto."""
+        if not self.filter_injected:
+            return callback
+        markers = self.markers
+        marker_code = self._marker_code
+
+        def hook(event):
+            if markers.pending and markers.consume(marker_code(event)):
+                return True
+            return callback(event)
+        return hook
+
+    def _marker_code(self, event):
+        """Código que identifica um evento na tabela de marcas."""
+        raise NotImplementedError
+
+
+class KeyboardBackend(InputBackend):
+    """Backend real (Windows) baseado na biblioteca `keyboard`."""
+
+    def __init__(self):
+        import keyboard
+        self._keyboard = keyboard
+        self.scheduler = Scheduler(self.now)
+        self.markers = InjectionMarkers(self.now)
+        # As tabelas de nomes por scan code só existem no backend Windows da biblioteca
+        self.resolves_slots = hasattr(keyboard._os_keyboard, 'keypad_keys')
+        if self.resolves_slots:
+            self.shared_slots = self._find_shared_slots()
+
+    def hook(self, callback):
+        return self._keyboard.hook(self._skip_own_events(callback), suppress=True)
+
+    def unhook(self, handle):
+        self._keyboard.unhook(handle)
+
+    def send(self, key):
+        self._mark(key, KEY_DOWN)
+        self._mark(key, KEY_UP)
+        self._keyboard.send(key)
+
+    def press(self, key):
+        self._mark(key, KEY_DOWN)
+        self._keyboard.press(key)
+
+    def release(self, key):
+        self._mark(key, KEY_UP)
+        self._keyboard.release(key)
+
+    def _mark(self, key, event_type):
+        parts = [part.strip() for part in key.split('+')]
+        if event_type == KEY_UP:
+            parts.reverse()
+        self.markers.add([(event_type, code) for part in parts for code in self._event_codes(part)])
+
+    def _event_codes(self, name):
+        """scan_code de cada evento que a injeção da tecla gera (como a biblioteca keyboard os entrega)."""
+        code = self._keyboard.key_to_scan_codes(name)[0]
+        return (code, code) if code == ALT_GR_SCAN_CODE else (code,)   # Alt Gr = ctrl + alt, os dois com esse scan
+
+    def _marker_code(self, event):
+        return (event.event_type, event.scan_code)
+
+    def event_slot(self, event):
+        code = event.scan_code
+        if 0 < code < 0x100:
+            return code | EXTENDED_SLOT if event.is_keypad else code
+        return ALT_GR_SLOT if code == ALT_GR_SCAN_CODE else 0
+
+    def _entry_slot(self, os_keyboard, scan_code, vk, extended):
+        if scan_code == ALT_GR_SCAN_CODE:
+            return ALT_GR_SLOT
+        if not 0 < scan_code < 0x100:
+            return None
+        # A biblioteca só expõe is_keypad nos eventos (não o bit de tecla estendida)
+        return scan_code | EXTENDED_SLOT if (scan_code, vk, extended) in os_keyboard.keypad_keys else scan_code
+
+    def key_slots(self, name):
+        os_keyboard = self._keyboard._os_keyboard
+        os_keyboard._setup_name_tables()
+        name = self._keyboard.normalize_name(name)
+        if name in self._keyboard.sided_modifiers:
+            return self.key_slots('left ' + name) + self.key_slots('right ' + name)
+        slots = []
+        for _, (scan_code, vk, extended, modifiers) in os_keyboard.from_name.get(name, ()):
+            slot = self._entry_slot(os_keyboard, scan_code, vk, extended)
+            if not modifiers and slot is not None and slot not in slots:
+                slots.append(slot)
+        return tuple(slots)
+
+    def _find_shared_slots(self):
+        """Slots de teclas físicas diferentes (virtual keys diferentes), ex: ctrl esquerdo e direito."""
+        os_keyboard = self._keyboard._os_keyboard
+        os_keyboard._setup_name_tables()
+        vks = {}
+        for scan_code, vk, extended, modifiers in os_keyboard.to_name:
+            slot = self._entry_slot(os_keyboard, scan_code, vk, extended)
+            if not modifiers and slot is not None:
+                vks.setdefault(slot, set()).add(vk)
+        return frozenset(slot for slot, found in vks.items() if len(found) > 1)
+
+    def compile_batch(self, items):
+        os_keyboard = self._keyboard._os_keyboard
+        # Marcas dos eventos de tecla do lote (texto unicode não volta pelo hook)
+        codes = tuple((KEY_DOWN if item[2] else KEY_UP, code)
+                      for item in items if item[0] != 'text' for code in self._event_codes(item[1]))
+        if not hasattr(os_keyboard, 'SendInput'):
+            # Fora do Windows: lote de chamadas já resolvidas da biblioteca
+            return (codes, [self._resolve_item(item) for item in items])
+        
+        # Windows: um único array INPUT para o SendInput, montado agora e reusado
+        inputs = []
+        for item in items:
+            if item[0] == 'text':
+                inputs += self._unicode_inputs(os_keyboard, item[1])
+                continue
+            _, name, down = item
+            flags = 0 if down else os_keyboard.KEYEVENTF_KEYUP
+            for vk, scan_code in self._virtual_keys(os_keyboard, name):
+                inputs.append(os_keyboard.INPUT(os_keyboard.INPUT_KEYBOARD, os_keyboard._INPUTunion(
+                    ki=os_keyboard.KEYBDINPUT(vk, scan_code, flags, 0, None))))
+        return (codes, len(inputs), (os_keyboard.INPUT * len(inputs))(*inputs))
+
+    def inject(self, batch):
+        if batch[0]:
+            self.markers.add(batch[0])
+        if len(batch) == 2:
+            for action, value in batch[1]:
+                action(value)
+            return
+        _, count, inputs = batch
+        if count:
+            os_keyboard = self._keyboard._os_keyboard
+            os_keyboard.SendInput(count, inputs, ctypes.sizeof(os_keyboard.INPUT))
+
+    def _resolve_item(self, item):
+        if item[0] == 'text':
+            return (self._keyboard.write, item[1])
+        _, name, down = item
+        scan_code = self._keyboard.key_to_scan_codes(name)[0]
+        os_keyboard = self._keyboard._os_keyboard
+        return (os_keyboard.press if down else os_keyboard.release, scan_code)
+
+    def _virtual_keys(self, os_keyboard, name):
+        """Mesma tradução scan code -> (vk, scan) usada pelo keyboard._winkeyboard._send_event."""
+        code = self._keyboard.key_to_scan_codes(name)[0]
+        if code == ALT_GR_SCAN_CODE:
+            # Alt Gr = ctrl + alt
+            return [(0x11, code), (0x12, code)]
+        if code > 0:
+            return [(os_keyboard.scan_code_to_vk.get(code, 0), code)]
+        return [(-code, 0)]
+
+    def _unicode_inputs(self, os_keyboard, text):
+        inputs = []
+        data = text.encode('utf-16le')
+        for i in range(0, len(data), 2):
+            unit = data[i] | (data[i + 1] << 8)
+            for flags in (os_keyboard.KEYEVENTF_UNICODE, os_keyboard.KEYEVENTF_UNICODE | os_keyboard.KEYEVENTF_KEYUP):
+                inputs.append(os_keyboard.INPUT(os_keyboard.INPUT_KEYBOARD, os_keyboard._INPUTunion(
+                    ki=os_keyboard.KEYBDINPUT(0, unit, flags, 0, None))))
+        return inputs
+
+    def now(self):
+        return time.monotonic()
+
+    def stop(self):
+        self.scheduler.stop()
+        self._keyboard.unhook_all()
+
+
+class SimulatedBackend(InputBackend):
+    """Backend em memória, determinístico e sem threads.
+
+    Eventos físicos entram por `feed`/`tap`; o relógio só anda com `advance`.
+    Eventos injetados pelo handler passam de novo pelos hooks depois que o
+    evento atual termina, como acontece com o SendInput no Windows (e são
+    filtrados pela mesma tabela de marcas do backend real).
+    Tudo que "chega ao sistema" fica em `output` como (event_type, name, injected).
+    """
+    resolves_slots = True
+
+    def __init__(self, start_time=0.0):
+        self.clock = start_time
+        self.hooks = []
+        self.output = []
+        self.injected_count = 0
+        self.inject_calls = 0
+        self._pending = []
+        self._dispatching = False
+        self.scheduler = ManualScheduler(self.now)
+        self.markers = InjectionMarkers(self.now)
+
+    # --- InputBackend ---
+
+    def hook(self, callback):
+        handle = self._skip_own_events(callback)
+        self.hooks.append(handle)
+        return handle
+
+    def unhook(self, handle):
+        if handle in self.hooks:
+            self.hooks.remove(handle)
+
+    def send(self, key):
+        self.press(key)
+        self.release(key)
+
+    def press(self, key):
+        for part in key.split('+'):
+            self._inject(KEY_DOWN, part.strip())
+
+    def release(self, key):
+        for part in reversed(key.split('+')):
+            self._inject(KEY_UP, part.strip())
+
+    def compile_batch(self, items):
+        batch = []
+        for item in items:
+            if item[0] == 'text':
+                batch += [('text', char) for char in item[1]]
+            else:
+                _, name, down = item
+                batch.append((KEY_DOWN if down else KEY_UP, name))
+        return tuple(batch)
+
+    def inject(self, batch):
+        self.inject_calls += 1
+        for event_type, name in batch:
+            if event_type == 'text':
+                # Texto unicode (VK_PACKET) não volta para os hooks
+                self.injected_count += 1
+                self.output.append((event_type, name, True))
+            else:
+                self._inject(event_type, name)
+
+    def now(self):
+        return self.clock
+
+    def _marker_code(self, event):
+        return (event.event_type, event.name)
+
+    def key_slots(self, name):
+        slot = SIMULATED_SCAN_CODES.get(name)
+        return (slot,) if slot else ()
+
+    def event_slot(self, event):
+        return event.scan_code or 0
+
+    def stop(self):
+        self.hooks.clear()
+        self.scheduler.stop()
+
+    # --- Simulação ---
+
+    def feed(self, event_type, name, scan_code=None):
+        """Entrega um evento físico aos hooks. Retorna True se não foi suprimido."""
+        passed = self._dispatch(self.make_event(event_type, name, scan_code), False)
+        self._drain()
+        return passed
+
+    def make_event(self, event_type, name, scan_code=None):
+        """Evento físico como o backend real entrega (nome em minúsculas e scan code)."""
+        name = name.lower()
+        if scan_code is None:
+            scan_code = SIMULATED_SCAN_CODES.get(name)
+        return KeyEvent(event_type, name, scan_code, self.clock)
+
+    def tap(self, name):
+        self.feed(KEY_DOWN, name)
+        return self.feed(KEY_UP, name)
+
+    def advance(self, seconds):
+        """Avança o relógio, disparando no horário exato os timers que vencerem."""
+        target = self.clock + seconds
+        self.scheduler.run_until(target, set_clock=self._set_clock)
+        self.clock = target
+
+    def _set_clock(self, value):
+        self.clock = value
+
+    def _inject(self, event_type, name):
+        self.injected_count += 1
+        self.markers.add(((event_type, name),))
+        self._pending.append(KeyEvent(event_type, name, None, self.clock))
+        if not self._dispatching:
+            self._drain()
+
+    def _dispatch(self, event, injected):
+        self._dispatching = True
+        try:
+            for callback in list(self.hooks):
+                if not callback(event):
+                    return False
+        finally:
+            self._dispatching = False
+        self.output.append((event.event_type, event.name, injected))
+        return True
+
+    def _drain(self):
+        while self._pending:
+            self._dispatch(self._pending.pop(0), True)
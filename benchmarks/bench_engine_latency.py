@@ -0,0 +1,108 @@
+"""Latência do hook com a thread do motor, com e sem atividade concorrente da GUI/bandeja.
+
+Uso:
+    python -m benchmarks.bench_engine_latency [--events 20000] [--load-interval 0.001] [--json saida.json]
+
+A thread principal faz o papel da thread do teclado e chama o hook com teclas
+mapeadas e não mapeadas; com carga, duas threads (GUI e bandeja) trocam
+perfil, recarregam o mapeamento e ligam/desligam o lock sem parar.
+- "engine": como o app roda hoje: todo o estado é do Scheduler (thread do
+            motor); o hook só enfileira ou espera a decisão dele.
+- "inline": sem thread do motor (ManualScheduler), como antes: cada thread
+            mexe no estado direto, sem sincronização.
+"""
+import argparse
+import threading
+import time
+
+from benchmarks.common import MemoryConfig, summarize, write_results
+from backends import KEY_DOWN, KEY_UP, SIMULATED_SCAN_CODES, KeyEvent, SimulatedBackend
+from keyboard_hook import KeyboardHandler
+from scheduler import Scheduler
+
+KEY_MAP = {'w': 'up', 'a': 'left', 's': 'down', 'd': 'right', 'q': 'ctrl+z'}
+KEYS = ['w', 'x', 'a', 'e', 's', 'd', 'q', 'y']
+
+
+class CountingBackend(SimulatedBackend):
+    """Relógio real e injeções só contadas (não voltam para o hook)."""
+
+    def __init__(self, threaded):
+        super().__init__()
+        if threaded:
+            self.scheduler = Scheduler(self.now)
+
+    def now(self):
+        return time.perf_counter()
+
+    def _inject(self, event_type, name):
+        self.injected_count += 1
+
+
+def load(handler, actions, interval, stop):
+    while not stop.is_set():
+        for action in actions:
+            action()
+            time.sleep(interval)
+
+
+def measure(threaded, with_load, events, interval):
+    config = MemoryConfig(key_map=KEY_MAP)
+    config.create_profile("Jogos")
+    config.set_active_profile("Jogos")
+    config.set("key_map", dict(KEY_MAP))
+    config.set_active_profile("Default")
+    backend = CountingBackend(threaded)
+    handler = KeyboardHandler(config, backend=backend)
+
+    stop = threading.Event()
+    threads = []
+    if with_load:
+        gui = [lambda: handler.switch_profile("Jogos"), handler.update_config,
+               lambda: handler.switch_profile("Default")]
+        tray = [lambda: handler.set_state(False), lambda: handler.set_state(True)]
+        threads = [threading.Thread(target=load, args=(handler, actions, interval, stop), daemon=True)
+                   for actions in (gui, tray)]
+        for thread in threads:
+            thread.start()
+
+    hook = handler._global_hook
+    latencies = []
+    start = time.perf_counter()
+    for i in range(events):
+        name = KEYS[i % len(KEYS)]
+        for event_type in (KEY_DOWN, KEY_UP):
+            event = KeyEvent(event_type, name, SIMULATED_SCAN_CODES[name], time.perf_counter())
+            t0 = time.perf_counter()
+            hook(event)
+            latencies.append(time.perf_counter() - t0)
+        time.sleep(0.0001)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    handler.stop()
+    result = summarize(latencies, elapsed)
+    result["toggles"] = handler.metrics.toggles.value
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="teclas (cada uma = KEY_DOWN + KEY_UP)")
+    parser.add_argument("--load-interval", type=float, default=0.001, help="pausa (s) entre ações da GUI/bandeja")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    results = {"load_interval_s": args.load_interval, "modes": {}}
+    for mode, threaded in (("engine", True), ("inline", False)):
+        results["modes"][mode] = {
+            "idle": measure(threaded, False, args.events, args.load_interval),
+            "gui_tray_load": measure(threaded, True, args.events, args.load_interval),
+        }
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
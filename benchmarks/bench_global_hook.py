@@ -0,0 +1,83 @@
+"""Microbenchmark do custo por evento de KeyboardHandler._global_hook.
+
+Uso:
+    python -m benchmarks.bench_global_hook [--json saida.json] [--compare anterior.json]
+
+Chama o hook diretamente (sem backend no meio) com eventos pré-construídos
+(com scan code, como os do backend real), separando teclas mapeadas, não
+mapeadas e ignoradas.
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import MemoryConfig, write_results
+from backends import KEY_DOWN, KEY_UP, SimulatedBackend
+from keyboard_hook import KeyboardHandler
+
+KEY_MAP = {chr(c): 'f%d' % (c - 96) for c in range(ord('a'), ord('l'))}
+KEY_MAP.update({'ctrl+b': 'home', 'ctrl+e': 'end'})
+
+CASES = {
+    # Lock ligado, tecla mapeada (remapeia e envia)
+    "mapped_active": (True, ['a', 'b', 'c']),
+    # Lock desligado: caminho mais comum do dia a dia
+    "unmapped_inactive": (False, ['x', 'y', 'z']),
+    # Modificadores e tecla de ativação
+    "ignored_inactive": (False, ['shift', 'ctrl', 'caps lock']),
+}
+
+
+class CountingBackend(SimulatedBackend):
+    """Só conta as injeções: o custo medido é o do hook, não o do simulador."""
+
+    def _inject(self, event_type, name):
+        self.injected_count += 1
+
+
+def measure(active, names, iterations, repeats):
+    backend = CountingBackend()
+    handler = KeyboardHandler(MemoryConfig(key_map=KEY_MAP, fn_lock_active=active), backend=backend)
+    events = []
+    for name in names:
+        events.append(backend.make_event(KEY_DOWN, name))
+        events.append(backend.make_event(KEY_UP, name))
+    hook = handler._global_hook
+
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for event in events:
+                hook(event)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    handler.stop()
+    return round(best / (iterations * len(events)) * 1e9, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=7, help="usa o melhor de N rodadas")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--compare", help="resultado anterior para calcular a diferença")
+    args = parser.parse_args(argv)
+
+    results = {"ns_per_event": {}}
+    for case, (active, names) in CASES.items():
+        results["ns_per_event"][case] = measure(active, names, args.iterations, args.repeats)
+
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)["ns_per_event"]
+        results["before_ns_per_event"] = before
+        results["speedup"] = {
+            case: round(before[case] / value, 2)
+            for case, value in results["ns_per_event"].items() if case in before and value
+        }
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Tempo de abertura e atualização do KeyConfigWindow em função do tamanho do mapa.
+
+Uso:
+    python -m benchmarks.bench_key_config [--sizes 100 1000 10000] [--json saida.json]
+
+Precisa de um display (Tk). Mede, para cada tamanho:
+- open_ms: construir a janela e desenhar a primeira tela
+- refresh_ms: recarregar a lista inteira (caminho do "Importar JSON")
+- add_ms / remove_ms: adicionar e remover um mapeamento
+"""
+import argparse
+import time
+
+import customtkinter as ctk
+
+from benchmarks.common import MemoryConfig, write_results
+from gui import KeyConfigWindow
+
+
+def _timed(root, action):
+    start = time.perf_counter()
+    action()
+    root.update()
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def measure(root, size):
+    key_map = {f"key{i}": f"dst{i}" for i in range(size)}
+    config = MemoryConfig(key_map=key_map)
+    result = {}
+    holder = {}
+
+    def open_window():
+        holder["window"] = KeyConfigWindow(root, config, None)
+
+    result["open_ms"] = _timed(root, open_window)
+    window = holder["window"]
+    result["refresh_ms"] = _timed(root, window._refresh_list)
+
+    def add():
+        window.src_entry.insert(0, "new key")
+        window.dst_entry.insert(0, "up")
+        window._add_mapping()
+
+    result["add_ms"] = _timed(root, add)
+    result["remove_ms"] = _timed(root, lambda: window._remove_mapping("key0"))
+    window.window.destroy()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    root = ctk.CTk()
+    root.withdraw()
+    results = {"sizes": {}}
+    for size in args.sizes:
+        results["sizes"][str(size)] = measure(root, size)
+    root.destroy()
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Inicialização e gravação com muitos perfis: biblioteca (índice + um arquivo por perfil) vs arquivo único.
+
+Uso:
+    python -m benchmarks.bench_profile_library [--profiles 500] [--keys 40] [--sets 50] [--json saida.json]
+
+Numa pasta temporária, grava um settings.json no formato antigo (todos os
+perfis dentro dele) e deixa o Config migrar. Mede:
+- load_ms: abrir o Config e compilar o perfil atual (KeyboardHandler pronto)
+- settings_kb: tamanho do settings.json lido na inicialização
+- bytes_per_set: bytes gravados por alteração (set + flush) num perfil
+- switch_cold_ms: trocar para um perfil ainda não lido nem compilado
+"single_file" reproduz o formato antigo: o arquivo inteiro é lido,
+todos os perfis são compilados e todo set regrava o arquivo todo.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import write_results
+from backends import SimulatedBackend
+from keymap import PlanCache, compile_keymap
+
+KEYS = list("abcdefghijklmnopqrstuvwxyz0123456789") + [f"f{n}" for n in range(1, 13)]
+DESTINATIONS = ["up", "down", "left", "right", "ctrl+z", "ctrl+c", "page up", "home"]
+
+
+def old_settings(profiles, keys):
+    bodies = {}
+    for p in range(profiles):
+        key_map = {key: DESTINATIONS[(i + p) % len(DESTINATIONS)] for i, key in enumerate(KEYS[:keys])}
+        bodies["Default" if p == 0 else f"Jogo {p}"] = {"key_map": key_map, "smart_typing": False}
+    return {"fn_lock_active": True, "current_profile": "Default", "app_rules": {}, "profiles": bodies}
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def measure_library(data, sets):
+    from config import CONFIG_FILE, Config
+    from keyboard_hook import KeyboardHandler
+
+    with open(CONFIG_FILE, "w") as f:
+        json.dump(data, f)
+    Config().flush()   # Migração (uma vez só)
+
+    start = time.perf_counter()
+    config = Config()
+    handler = KeyboardHandler(config, backend=SimulatedBackend())
+    load_ms = (time.perf_counter() - start) * 1000
+    settings_kb = os.path.getsize(CONFIG_FILE) / 1024
+
+    written = 0
+    for i in range(sets):
+        config.set("smart_typing", bool(i % 2))
+        config.flush()
+        written += os.path.getsize(CONFIG_FILE) + os.path.getsize(
+            os.path.join("profiles", config.config["profile_index"]["Default"]["file"]))
+
+    start = time.perf_counter()
+    handler.switch_profile(config.get_profile_names()[-1])
+    switch_ms = (time.perf_counter() - start) * 1000
+    handler.stop()
+    return {
+        "load_ms": round(load_ms, 2),
+        "settings_kb": round(settings_kb, 1),
+        "profiles_dir_kb": round(_dir_bytes("profiles") / 1024, 1),
+        "bytes_per_set": written // sets,
+        "switch_cold_ms": round(switch_ms, 3),
+    }
+
+
+def measure_single_file(data, sets):
+    path = "single.json"
+    with open(path, "w") as f:
+        json.dump(data, f, indent=4)
+
+    backend = SimulatedBackend()
+    start = time.perf_counter()
+    with open(path) as f:
+        loaded = json.load(f)
+    plans = PlanCache(backend.compile_batch)
+    for name, body in loaded["profiles"].items():
+        compile_keymap(body.get("key_map"), backend.compile_batch, name=name, plans=plans,
+                       key_slots=backend.key_slots if backend.resolves_slots else None,
+                       shared_slots=backend.shared_slots)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    written = 0
+    for i in range(sets):
+        loaded["profiles"]["Default"]["smart_typing"] = bool(i % 2)
+        text = json.dumps(loaded, indent=4)
+        with open(path, "w") as f:
+            f.write(text)
+        written += len(text.encode("utf-8"))
+    return {
+        "load_ms": round(load_ms, 2),
+        "settings_kb": round(os.path.getsize(path) / 1024, 1),
+        "bytes_per_set": written // sets,
+        "switch_cold_ms": 0.0,   # Tudo já compilado na inicialização
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--keys", type=int, default=40, help=f"mapeamentos por perfil (até {len(KEYS)})")
+    parser.add_argument("--sets", type=int, default=50, help="alterações gravadas")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    data = old_settings(args.profiles, args.keys)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp()
+    try:
+        os.chdir(workdir)
+        results = {
+            "profiles": args.profiles,
+            "single_file": measure_single_file(data, args.sets),
+            "library": measure_library(data, args.sets),
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    single, library = results["single_file"], results["library"]
+    results["load_speedup"] = round(single["load_ms"] / library["load_ms"], 1) if library["load_ms"] else None
+    results["write_ratio"] = round(library["bytes_per_set"] / single["bytes_per_set"], 4)
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Replay de traces pelo hot path do KeyboardHandler.
+
+Uso:
+    python -m benchmarks.bench_replay [--speed 0] [--trace arquivo.jsonl] [--json saida.json]
+
+--speed 0 roda o mais rápido possível; 1.0 reproduz em tempo real.
+Com Smart Typing, cada trace também roda no modo fixo e no adaptativo; o bloco
+"smart_typing" compara pausas, tempo pausado e teclas remapeadas nos dois.
+"""
+import argparse
+import time
+
+from benchmarks.common import MemoryConfig, summarize, write_results
+from benchmarks import traces
+from backends import SimulatedBackend
+from keyboard_hook import KeyboardHandler
+
+
+def replay(trace, key_map=traces.WASD_MAP, smart_typing=True, speed=0.0, adaptive=True):
+    backend = SimulatedBackend()
+    config = MemoryConfig(key_map=key_map, smart_typing=smart_typing, adaptive_smart_typing=adaptive)
+    handler = KeyboardHandler(config, backend=backend)
+
+    latencies = []
+    passed = 0
+    perf = time.perf_counter
+    wall_start = perf()
+    last_t = trace[0][0] if trace else 0.0
+    for t, event_type, name in trace:
+        backend.advance(t - last_t)
+        last_t = t
+        if speed > 0:
+            delay = wall_start + t / speed - perf()
+            if delay > 0:
+                time.sleep(delay)
+        start = perf()
+        if backend.feed(event_type, name):
+            passed += 1
+        latencies.append(perf() - start)
+    elapsed = sum(latencies)
+
+    handler.stop()
+    result = summarize(latencies, elapsed)
+    result["passed"] = passed
+    result["suppressed"] = len(trace) - passed
+    result["synthetic_events"] = backend.injected_count
+    result["inject_calls"] = backend.inject_calls
+    result["pause_stats"] = pause_stats(handler, backend.now())
+    return result
+
+
+def pause_stats(handler, end):
+    """Pausas do Smart Typing no replay (uma pausa ainda aberta conta até o fim do trace)."""
+    metrics = handler.metrics
+    durations = metrics.pause_seconds.sum
+    if handler.paused:
+        durations += end - handler.pause_started
+    pauses = metrics.pauses.value
+    return {
+        "remapped": metrics.events_remapped.value,
+        "pauses": pauses,
+        "paused_s": round(durations, 3),
+        "mean_pause_ms": round(durations / pauses * 1000, 1) if pauses else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--speed", type=float, default=0.0)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--trace", action="append", default=[], help="trace JSONL gravado (pode repetir)")
+    parser.add_argument("--no-smart-typing", action="store_true")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        named = {path: traces.load(path) for path in args.trace}
+    else:
+        named = {name: build(args.seconds) for name, build in traces.BUILTIN.items()}
+
+    smart_typing = not args.no_smart_typing
+    results = {"speed": args.speed, "smart_typing": smart_typing, "traces": {}}
+    for name, trace in named.items():
+        result = replay(trace, smart_typing=smart_typing, speed=args.speed)
+        stats = result.pop("pause_stats")
+        if smart_typing:
+            fixed = replay(trace, smart_typing=True, adaptive=False)
+            result["smart_typing"] = {"adaptive": stats, "fixed": fixed["pause_stats"]}
+        results["traces"][name] = result
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Benchmark de inicialização: tempo até o hook ficar ativo e memória residente.
+
+Uso:
+    python -m benchmarks.bench_startup [--repeats 5] [--real-backend] [--json saida.json]
+
+Cada medição é um processo Python novo (pasta temporária, sem settings.json):
+- "lazy":  como main.py faz hoje: MainApp (hook ativo) e só depois a pilha de UI
+           (customtkinter, PIL, pystray, gui) é importada.
+- "eager": importa a pilha de UI antes de criar o MainApp, como era antes.
+O tempo conta desde o lançamento do processo (inclui o interpretador).
+Sem --real-backend o hook é o do SimulatedBackend (não precisa de Windows).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pilha de UI que o main.py carregava antes do hook
+UI_MODULES = ("customtkinter", "PIL.Image", "pystray", "overlay", "gui", "tray")
+
+
+def rss_mb():
+    """Memória residente atual do processo (MB), ou None se não houver como medir."""
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().rss / 2**20, 1)
+    except ImportError:
+        pass
+    if os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return round(counters.WorkingSetSize / 2**20, 1)
+    return None
+
+
+def import_ui():
+    failed = []
+    for module in UI_MODULES:
+        try:
+            __import__(module)
+        except Exception:
+            failed.append(module)
+    return failed
+
+
+def child(mode, real_backend):
+    """Roda dentro do processo medido; imprime uma linha JSON com os instantes."""
+    failed = import_ui() if mode == "eager" else []
+
+    from main import MainApp
+    backend = None
+    if not real_backend:
+        from backends import SimulatedBackend
+        backend = SimulatedBackend()
+    app = MainApp(backend=backend)
+    result = {"hook_at": time.time(), "hook_rss_mb": rss_mb()}
+
+    if mode == "lazy":
+        failed = import_ui()
+    result["ui_at"] = time.time()
+    result["ui_rss_mb"] = rss_mb()
+    result["ui_import_failed"] = failed
+    app.keyboard_handler.stop()
+    print(json.dumps(result))
+
+
+def run_once(mode, real_backend):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode]
+    if real_backend:
+        command.append("--real-backend")
+    with tempfile.TemporaryDirectory() as cwd:
+        launched = time.time()
+        output = subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return {
+        "hook_ms": (result["hook_at"] - launched) * 1000,
+        "ui_ms": (result["ui_at"] - launched) * 1000,
+        "hook_rss_mb": result["hook_rss_mb"],
+        "ui_rss_mb": result["ui_rss_mb"],
+        "ui_import_failed": result["ui_import_failed"],
+    }
+
+
+def measure(mode, repeats, real_backend):
+    runs = [run_once(mode, real_backend) for _ in range(repeats)]
+    hook = sorted(run["hook_ms"] for run in runs)
+    return {
+        "time_to_hook_ms": round(hook[len(hook) // 2], 1),
+        "time_to_hook_min_ms": round(hook[0], 1),
+        "time_to_ui_loaded_ms": round(sorted(run["ui_ms"] for run in runs)[len(runs) // 2], 1),
+        "rss_at_hook_mb": runs[-1]["hook_rss_mb"],
+        "rss_with_ui_mb": runs[-1]["ui_rss_mb"],
+        "ui_import_failed": runs[-1]["ui_import_failed"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--real-backend", action="store_true", help="usa o hook real (biblioteca keyboard)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--child", choices=("lazy", "eager"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.real_backend)
+        return
+
+    results = {
+        "backend": "keyboard" if args.real_backend else "simulated",
+        "repeats": args.repeats,
+        "modes": {mode: measure(mode, args.repeats, args.real_backend) for mode in ("lazy", "eager")},
+    }
+    write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from profile_library import ProfileLibrary
+
+
+class MemoryLibrary(ProfileLibrary):
+    """Biblioteca de perfis só em memória: arquivo ausente = perfil padrão."""
+
+    def read(self, entry):
+        return dict(self.defaults)
+
+    def write(self, file, body):
+        pass
+
+    def remove(self, file):
+        pass
+
+
+class MemoryConfig(Config):
+    """Config que nunca toca o disco (para benchmarks)."""
+
+    def __init__(self, key_map=None, smart_typing=False, fn_lock_active=True, adaptive_smart_typing=True):
+        super().__init__()
+        self.library = MemoryLibrary(defaults=self.default_profile_data)
+        if key_map is not None:
+            self.set("key_map", dict(key_map))
+        self.set("smart_typing", smart_typing)
+        self.config["fn_lock_active"] = fn_lock_active
+        self.config["adaptive_smart_typing"] = adaptive_smart_typing
+
+    def load_config(self):
+        return json.loads(json.dumps(self.default_config))
+
+    def save_config(self):
+        pass
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed):
+    """Resumo de latências (em segundos) -> dict em microssegundos."""
+    values = sorted(latencies)
+    return {
+        "events": len(values),
+        "p50_us": round(percentile(values, 50) * 1e6, 3),
+        "p99_us": round(percentile(values, 99) * 1e6, 3),
+        "max_us": round(values[-1] * 1e6, 3) if values else 0.0,
+        "events_per_sec": round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def write_results(results, path=None):
+    """Imprime os resultados em JSON (e grava em `path`, se informado)."""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
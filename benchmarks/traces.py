@@ -0,0 +1,100 @@
+"""Traces de teclado para replay: listas de (tempo, event_type, nome)."""
+import json
+import random
+
+from backends import KEY_DOWN, KEY_UP
+
+WASD_MAP = {'w': 'up', 'a': 'left', 's': 'down', 'd': 'right'}
+
+PROSE = (
+    "the quick brown fox jumps over the lazy dog while we wait for the "
+    "next round to start and then we type a few more words about nothing "
+)
+
+
+def _press(trace, t, name, hold):
+    trace.append((t, KEY_DOWN, name))
+    trace.append((t + hold, KEY_UP, name))
+
+
+def gaming_wasd(seconds=10.0, seed=1):
+    """Rajadas de WASD com auto-repeat, como em um jogo."""
+    rng = random.Random(seed)
+    trace = []
+    t = 0.0
+    while t < seconds:
+        key = rng.choice('wasd')
+        hold = rng.uniform(0.15, 0.6)
+        trace.append((t, KEY_DOWN, key))
+        # Auto-repeat do SO: 500 ms de atraso, depois ~30 Hz
+        repeat = t + 0.5
+        while repeat < t + hold:
+            trace.append((repeat, KEY_DOWN, key))
+            repeat += 0.033
+        trace.append((t + hold, KEY_UP, key))
+        t += hold + rng.uniform(0.02, 0.12)
+    return sorted(trace, key=lambda e: e[0])
+
+
+def gaming_stray(seconds=10.0, seed=4, every=2.0):
+    """Jogo com uma tecla solta fora do mapa (ex: um número) a cada `every` segundos."""
+    rng = random.Random(seed)
+    trace = gaming_wasd(seconds, seed)
+    t = every
+    while t < seconds:
+        _press(trace, t, rng.choice('12345'), 0.06)
+        t += every
+    return sorted(trace, key=lambda e: e[0])
+
+
+def prose_typing(seconds=10.0, seed=2, wpm=70):
+    """Digitação de texto corrido (quase tudo fora do mapa)."""
+    rng = random.Random(seed)
+    interval = 60.0 / (wpm * 5)
+    trace = []
+    t = 0.0
+    i = 0
+    while t < seconds:
+        char = PROSE[i % len(PROSE)]
+        _press(trace, t, 'space' if char == ' ' else char, rng.uniform(0.04, 0.09))
+        t += rng.uniform(0.5, 1.5) * interval
+        i += 1
+    return sorted(trace, key=lambda e: e[0])
+
+
+def mixed(seconds=10.0, seed=3):
+    """Alterna trechos de jogo e de digitação (letras mapeadas no meio do texto)."""
+    trace = []
+    offset = 0.0
+    chunk = seconds / 4
+    for i in range(4):
+        part = gaming_wasd(chunk, seed + i) if i % 2 == 0 else prose_typing(chunk, seed + i)
+        trace.extend((t + offset, event_type, name) for t, event_type, name in part)
+        offset += chunk + 1.2
+    return trace
+
+
+BUILTIN = {
+    "gaming_wasd": gaming_wasd,
+    "gaming_stray": gaming_stray,
+    "prose": prose_typing,
+    "mixed": mixed,
+}
+
+
+def load(path):
+    """Carrega um trace gravado em JSONL: {"t": 0.1, "type": "down", "name": "w"}."""
+    trace = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                trace.append((record["t"], record["type"], record["name"]))
+    return trace
+
+
+def save(trace, path):
+    with open(path, "w") as f:
+        for t, event_type, name in trace:
+            f.write(json.dumps({"t": round(t, 6), "type": event_type, "name": name}) + "\n")
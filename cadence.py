@@ -0,0 +1,92 @@
+"""Modelo de cadência de teclas para o Smart Typing adaptativo.
+
+Guarda num buffer circular de tamanho fixo os intervalos entre as últimas
+teclas e a classe de cada uma (mapeada ou não) e mantém uma média móvel
+exponencial (EWMA) do ritmo de digitação. Com isso:
+
+- "jogo" (maioria das teclas recentes mapeadas): uma tecla solta fora do mapa
+  (ex: um número no meio do jogo) não pausa; só duas seguidas pausam.
+- "digitação": pausa na primeira tecla fora do mapa, como antes.
+- A retomada espera ritmo médio + 4 desvios (como o RTO do TCP), limitado
+  entre MIN_RESUME_DELAY e MAX_RESUME_DELAY, em vez de sempre 1 s; e
+  GAMING_RUN teclas mapeadas seguidas (texto tem espaços, jogo não) retomam na hora.
+"""
+from array import array
+
+WINDOW = 16                 # Teclas lembradas
+MIN_RESUME_DELAY = 0.4      # s
+MAX_RESUME_DELAY = 1.0      # s (o atraso fixo antigo)
+BURST_GAP = 0.6             # s: duas teclas fora do mapa mais próximas que isso = digitação
+MAX_TYPING_GAP = 1.5        # s: intervalos maiores são pausas, não ritmo de digitação
+GAMING_RUN = 6              # Teclas mapeadas seguidas que indicam jogo
+EWMA_ALPHA = 0.125
+DEVIATION_ALPHA = 0.25
+
+
+class CadenceModel:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.intervals = array('d', bytes(8 * window))
+        self.mapped = array('B', bytes(window))
+        self.position = 0
+        self.count = 0
+        self.mapped_count = 0
+        self.mapped_run = 0         # Teclas mapeadas seguidas (inclui auto-repeat)
+        self.last_time = None
+        self.interval = None        # EWMA do intervalo entre teclas digitadas (s)
+        self.deviation = 0.0        # EWMA do desvio absoluto
+
+    def observe(self, now, mapped):
+        """Registra uma tecla pressionada. Retorna True se ela deve pausar o remapeamento.
+
+        Só faz sentido pausar em teclas fora do mapa (mapped=False); para
+        teclas mapeadas o retorno é sempre False.
+        """
+        last = self.last_time
+        gap = now - last if last is not None else MAX_TYPING_GAP
+        self.last_time = now
+
+        i = self.position
+        previous = i - 1 if i else self.window - 1
+        previous_unmapped = self.count and not self.mapped[previous]
+        if not mapped and previous_unmapped and gap < MAX_TYPING_GAP:
+            self._update_rhythm(gap)
+
+        if self.count == self.window:
+            self.mapped_count -= self.mapped[i]
+        else:
+            self.count += 1
+        self.intervals[i] = gap
+        self.mapped[i] = mapped
+        self.mapped_count += mapped
+        self.position = i + 1 if i + 1 < self.window else 0
+
+        if mapped:
+            self.mapped_run += 1
+            return False
+        self.mapped_run = 0
+        if self.mapped_count * 2 <= self.count:
+            return True     # Digitando: pausa já na primeira tecla fora do mapa
+        # Jogando: só uma rajada (duas teclas fora do mapa seguidas) pausa
+        return bool(previous_unmapped) and gap < BURST_GAP
+
+    def _update_rhythm(self, gap):
+        if self.interval is None:
+            self.interval = gap
+            self.deviation = gap / 2
+            return
+        self.deviation += DEVIATION_ALPHA * (abs(gap - self.interval) - self.deviation)
+        self.interval += EWMA_ALPHA * (gap - self.interval)
+
+    @property
+    def gaming(self):
+        """True se as últimas teclas parecem jogo, não digitação."""
+        return self.mapped_run >= GAMING_RUN
+
+    @property
+    def resume_delay(self):
+        """Silêncio (s) até retomar o remapeamento, ajustado ao ritmo de quem digita."""
+        if self.interval is None:
+            return MAX_RESUME_DELAY
+        delay = self.interval + 4 * self.deviation
+        return min(MAX_RESUME_DELAY, max(MIN_RESUME_DELAY, delay))
@@ -1,16 +1,71 @@
 import json
 import os
+import shutil
+import threading
+import time
+
+from profile_library import PROFILE_CACHE_SIZE, PROFILES_DIR, ProfileLibrary, index_entry
 
 CONFIG_FILE = "settings.json"
 
+# Janela (s) em que várias alterações seguidas viram uma única escrita em disco
+SAVE_DEBOUNCE = 0.5
+
+
+def validate_config(data):
+    """Lista os problemas que impedem de usar a configuração (vazia = válida).
+
+    Aceita o índice da biblioteca de perfis ("profile_index") ou o formato de
+    arquivo único ("profiles" com os perfis inteiros), antes da migração.
+    """
+    problems = []
+    if "profile_index" in data:
+        profiles = data.get("profile_index")
+        kind = "'profile_index'"
+    else:
+        profiles = data.get("profiles")
+        kind = "'profiles'"
+    if not isinstance(profiles, dict) or not profiles:
+        return [f"{kind} deve ser um objeto com pelo menos um perfil"]
+    if data.get("current_profile") not in profiles:
+        problems.append(f"perfil atual '{data.get('current_profile')}' não existe")
+    if not isinstance(data.get("app_rules"), dict):
+        problems.append("'app_rules' deve ser um objeto")
+    for name, profile in profiles.items():
+        if "profile_index" in data:
+            if not isinstance(profile, dict) or not isinstance(profile.get("file"), str):
+                problems.append(f"perfil '{name}' do índice deve ter o nome do arquivo ('file')")
+        else:
+            problems += validate_profile(name, profile)
+    return problems
+
+
+def validate_profile(name, profile):
+    """Problemas no corpo de um perfil (estrutura e destinos do key_map)."""
+    from macros import parse_destination
+
+    if not isinstance(profile, dict):
+        return [f"perfil '{name}' deve ser um objeto"]
+    key_map = profile.get("key_map", {})
+    if not isinstance(key_map, dict):
+        return [f"'key_map' do perfil '{name}' deve ser um objeto"]
+    problems = []
+    for src, dst in key_map.items():
+        try:
+            parse_destination(dst)
+        except ValueError as e:
+            problems.append(f"perfil '{name}', '{src}': {e}")
+    return problems
+
 class Config:
-    PROFILE_SPECIFIC_KEYS = ['key_map', 'smart_typing', 'activation_key']
+    PROFILE_SPECIFIC_KEYS = ['key_map', 'smart_typing', 'activation_key', 'leader_key']
 
     def __init__(self):
         # Configuração base padrão
         self.default_profile_data = {
             "smart_typing": False,
             "activation_key": "right alt",
+            "leader_key": "",
             "key_map": {
                 'w': 'up',
                 'a': 'left',
@@ -24,106 +79,358 @@ class Config:
             "start_minimized": False,
             "run_on_startup": False,
             "current_profile": "Default",
-            "profiles": {
-                "Default": self.default_profile_data.copy()
+            "profile_next_hotkey": "ctrl+alt+page down",
+            "profile_prev_hotkey": "ctrl+alt+page up",
+            "app_rules": {},
+            "metrics_port": 0,
+            "trace_size": 4096,
+            "adaptive_smart_typing": True,
+            "profile_cache_size": PROFILE_CACHE_SIZE,
+            # Só o índice: os perfis ficam em arquivos separados (profile_library.py)
+            "profile_index": {
+                "Default": index_entry("Default.json", self.default_profile_data)
             }
         }
+
+        # Escrita em segundo plano (write-behind): save_config só marca como
+        # pendente; a thread de escrita agrupa as alterações e grava os arquivos.
+        self._lock = threading.RLock()
+        self._save_cond = threading.Condition(self._lock)
+        self._dirty = False
+        self._writer = None
+        # Uma gravação por vez (thread de escrita ou flush ao sair), sempre do
+        # snapshot mais novo; pego antes de self._lock, nunca depois
+        self._write_lock = threading.Lock()
+        self._last_written = None    # Texto da última gravação (o watcher ignora o próprio arquivo)
+        # Alterações ainda não gravadas: valem sobre o arquivo num recarregamento
+        self._dirty_keys = set()      # Opções globais
+        self._dirty_profiles = {}     # Perfil -> entrada do índice (None = apagado)
+        self.migrated = {}            # Perfis migrados do formato antigo, ainda não gravados
+
+        self.library = ProfileLibrary(PROFILES_DIR, defaults=self.default_profile_data)
         self.config = self.load_config()
+        self.library.capacity = self.config.get("profile_cache_size") or PROFILE_CACHE_SIZE
 
     def load_config(self):
         """Carrega as configurações do arquivo JSON com migração automática."""
         if os.path.exists(CONFIG_FILE):
             try:
-                with open(CONFIG_FILE, "r") as f:
-                    data = json.load(f)
-                    
-                # Verifica se precisa de migração (se não tem a chave 'profiles')
-                if "profiles" not in data:
-                    print("Migrando configuração antiga para sistema de perfis...")
-                    migrated_config = self.default_config.copy()
-                    
-                    # Copia configurações globais
-                    migrated_config["fn_lock_active"] = data.get("fn_lock_active", False)
-                    migrated_config["start_minimized"] = data.get("start_minimized", False)
-                    migrated_config["run_on_startup"] = data.get("run_on_startup", False)
-                    
-                    # Cria o perfil Default com os dados antigos
-                    default_profile = {
-                        "key_map": data.get("key_map", self.default_profile_data["key_map"]),
-                        "smart_typing": data.get("smart_typing", self.default_profile_data["smart_typing"]),
-                        "activation_key": data.get("activation_key", self.default_profile_data["activation_key"])
-                    }
-                    migrated_config["profiles"]["Default"] = default_profile
-                    
-                    return migrated_config
-                
-                # Merge seguro com default (para novos campos)
-                return {**self.default_config, **data}
+                data = self.read_config_file()
             except Exception as e:
                 print(f"Erro ao carregar config: {e}")
                 return self.default_config
+            if self.migrated:
+                # Guarda o arquivo antigo e grava os perfis e o settings.json já com o índice
+                shutil.copyfile(CONFIG_FILE, CONFIG_FILE + ".bak")
+                for name, body in self.migrated.items():
+                    self.library.write(data["profile_index"][name]["file"], body)
+                self._write_file(json.dumps(data, indent=4))
+                self.migrated = {}
+            return data
         return self.default_config
 
+    def read_config_file(self, validate=False, skip_own_write=False):
+        """Lê o settings.json (migrando o formato antigo). Levanta exceção se não der para ler.
+
+        Com validate=True, também recusa arquivos com estrutura ou destinos inválidos
+        (usado ao recarregar com o app rodando, para manter a última config boa).
+        Com skip_own_write=True, retorna None se o arquivo é o que o app gravou por último.
+        Não grava nada: os perfis de um arquivo no formato antigo ficam em
+        `migrated` até a leitura ser aceita (load_config ou finish_migration).
+        """
+        self.migrated = {}
+        with open(CONFIG_FILE, "r") as f:
+            text = f.read()
+        if skip_own_write and text == self._last_written:
+            return None
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError("o arquivo não contém um objeto JSON")
+        if "profile_index" in data:
+            # Merge seguro com default (para novos campos)
+            data = {**self.default_config, **data}
+            if validate:
+                problems = validate_config(data)
+                if problems:
+                    raise ValueError("; ".join(problems))
+            return data
+            
+        # Verifica se precisa de migração (se não tem a chave 'profiles')
+        if "profiles" not in data:
+            print("Migrando configuração antiga para sistema de perfis...")
+            migrated_config = self.default_config.copy()
+            
+            # Copia configurações globais
+            migrated_config["fn_lock_active"] = data.get("fn_lock_active", False)
+            migrated_config["start_minimized"] = data.get("start_minimized", False)
+            migrated_config["run_on_startup"] = data.get("run_on_startup", False)
+            
+            # Cria o perfil Default com os dados antigos
+            default_profile = {
+                "key_map": data.get("key_map", self.default_profile_data["key_map"]),
+                "smart_typing": data.get("smart_typing", self.default_profile_data["smart_typing"]),
+                "activation_key": data.get("activation_key", self.default_profile_data["activation_key"])
+            }
+            migrated_config["profiles"] = {"Default": default_profile}
+            data = migrated_config
+        else:
+            # Merge seguro com default (para novos campos)
+            data = {**self.default_config, **data}
+        # O índice padrão veio no merge; o de verdade é montado a partir de 'profiles'
+        data.pop("profile_index", None)
+            
+        if validate:
+            problems = validate_config(data)
+            if problems:
+                raise ValueError("; ".join(problems))
+        return self._migrate_to_library(data)
+
+    def _migrate_to_library(self, data):
+        """Formato de arquivo único -> índice + um arquivo por perfil (na pasta profiles/)."""
+        print(f"Migrando perfis para arquivos separados (pasta {PROFILES_DIR})...")
+        index = {}
+        for name, body in data["profiles"].items():
+            index[name] = index_entry(self.library.file_for(name, index), body)
+        self.migrated = dict(data["profiles"])
+        data = {key: value for key, value in data.items() if key != "profiles"}
+        data["profile_index"] = index
+        return data
+
+    def finish_migration(self):
+        """Grava os perfis migrados e o settings.json com o índice (depois de aceita a leitura)."""
+        bodies, self.migrated = self.migrated, {}
+        with self._lock:
+            index = self.config["profile_index"]
+            for name, body in bodies.items():
+                if name in index and name not in self._dirty_profiles:
+                    self.library.store(name, index[name], body)
+        self.save_config()
+
+    def snapshot(self):
+        """Cópia da configuração atual (para recarregar só os arquivos de perfil)."""
+        with self._lock:
+            return json.loads(json.dumps(self.config))
+
+    def changed_profiles(self, data):
+        """Perfis do índice `data` novos ou alterados em relação ao atual.
+
+        Mudou o hash no índice, ou o arquivo foi editado por fora (mtime/tamanho).
+        """
+        current = self.config.get("profile_index", {})
+        return [name for name, entry in data["profile_index"].items()
+                if current.get(name) != entry or self.library.modified(entry["file"])]
+
+    def read_profiles(self, data, names, validate=False):
+        """Lê do disco (sem cache) os perfis `names` do índice `data`. Levanta exceção se inválidos.
+
+        Retorna os corpos e a versão (mtime/tamanho) de cada arquivo lido.
+        """
+        bodies = {}
+        signatures = {}
+        problems = []
+        for name in names:
+            body = self.migrated.get(name)
+            if body is None:
+                entry = data["profile_index"][name]
+                signatures[entry["file"]] = self.library.signature(entry["file"])
+                body = self.library.read(entry)
+            bodies[name] = body
+            if validate:
+                problems += validate_profile(name, body)
+        if problems:
+            raise ValueError("; ".join(problems))
+        return bodies, signatures
+
+    def replace(self, data, bodies=None, signatures=None):
+        """Troca toda a configuração (já lida e validada). Retorna a anterior.
+
+        `bodies` e `signatures` são os perfis que mudaram no disco, já lidos
+        (read_profiles). Alterações feitas no app e ainda não gravadas são
+        mantidas por cima do arquivo (e gravadas em seguida). Um perfil
+        editado por fora tem a entrada dele no índice corrigida.
+        """
+        fixed = False
+        with self._lock:
+            for key in self._dirty_keys:
+                if key in self.config:
+                    data[key] = self.config[key]
+            index = data["profile_index"]
+            for name, entry in self._dirty_profiles.items():
+                if entry is None:
+                    index.pop(name, None)
+                else:
+                    index[name] = entry
+            old, self.config = self.config, data
+            for name in set(old.get("profile_index", {})) - set(index):
+                self.library.forget(name)
+            for name, body in (bodies or {}).items():
+                if name in self._dirty_profiles:
+                    continue
+                self.library.forget(name, body)
+                file = index[name]["file"]
+                if file in (signatures or {}):
+                    self.library.seen(file, signatures[file])
+                entry = index_entry(file, body)
+                if index[name] != entry:
+                    index[name] = self._dirty_profiles[name] = entry
+                    fixed = True
+        if fixed:
+            self.save_config()
+        return old
+
     def save_config(self):
-        """Salva as configurações atuais no arquivo JSON."""
+        """Agenda a gravação das configurações (não bloqueia em I/O)."""
+        with self._save_cond:
+            self._dirty = True
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+                self._writer.start()
+            self._save_cond.notify()
+
+    def flush(self):
+        """Grava imediatamente as alterações pendentes (ex: ao sair do app).
+
+        Se a thread de escrita estiver gravando, espera ela terminar.
+        """
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                self._dirty_keys.clear()
+                self._dirty_profiles.clear()
+                data = json.dumps(self.config, indent=4)
+                bodies, deleted = self.library.take_pending()
+            # Os perfis antes do índice: o índice nunca aponta para um arquivo desatualizado
+            try:
+                for file, body in bodies.items():
+                    self.library.write(file, body)
+                for file in deleted:
+                    self.library.remove(file)
+            except Exception as e:
+                print(f"Erro ao salvar perfis: {e}")
+            self._write_file(data)
+
+    def _writer_loop(self):
+        while True:
+            with self._save_cond:
+                while not self._dirty:
+                    self._save_cond.wait()
+            # Debounce: espera alterações em sequência antes de gravar
+            time.sleep(SAVE_DEBOUNCE)
+            self.flush()
+
+    def _write_file(self, data):
+        """Grava em arquivo temporário e renomeia (atômico: nunca deixa o JSON pela metade)."""
+        tmp_file = CONFIG_FILE + ".tmp"
+        self._last_written = data
         try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(self.config, f, indent=4)
+            with open(tmp_file, "w") as f:
+                f.write(data)
+            os.replace(tmp_file, CONFIG_FILE)
         except Exception as e:
             print(f"Erro ao salvar configurações: {e}")
 
     def get(self, key):
         """Obtém um valor. Se for específico de perfil, pega do perfil atual."""
         if key in self.PROFILE_SPECIFIC_KEYS:
-            current_profile = self.config.get("current_profile", "Default")
-            profiles = self.config.get("profiles", {})
-            profile_data = profiles.get(current_profile, self.default_profile_data)
-            return profile_data.get(key, self.default_profile_data.get(key))
+            return self.get_profile_data(self.get_current_profile_name())[key]
         
         return self.config.get(key, self.default_config.get(key))
 
     def set(self, key, value):
         """Define um valor. Se for específico de perfil, salva no perfil atual."""
         if key in self.PROFILE_SPECIFIC_KEYS:
-            current_profile = self.config.get("current_profile", "Default")
-            if current_profile not in self.config["profiles"]:
-                self.config["profiles"][current_profile] = self.default_profile_data.copy()
-            self.config["profiles"][current_profile][key] = value
-        else:
-            self.config[key] = value
+            self._profile_body(self.get_current_profile_name())   # Lê o arquivo antes do lock
+        with self._lock:
+            if key in self.PROFILE_SPECIFIC_KEYS:
+                current_profile = self.get_current_profile_name()
+                index = self.config["profile_index"]
+                if current_profile not in index:
+                    index[current_profile] = index_entry(self.library.file_for(current_profile, index),
+                                                         self.default_profile_data)
+                body = dict(self._profile_body(current_profile))
+                body[key] = value
+                self._store_profile(current_profile, body)
+            else:
+                self.config[key] = value
+                self._dirty_keys.add(key)
         self.save_config()
 
+    def _profile_body(self, name):
+        """Corpo de um perfil. O arquivo, se preciso, é lido fora do lock:
+        quem só altera a config (ex: ligar o lock) não espera o disco."""
+        with self._lock:
+            entry = self.config["profile_index"].get(name)
+            if entry is None:
+                return {}
+            body = self.library.peek(name, entry)
+        if body is not None:
+            return body
+        signature = self.library.signature(entry["file"])
+        body = self.library.load_file(name, entry)
+        with self._lock:
+            if self.config["profile_index"].get(name) is entry:
+                # O perfil pode ter sido carregado ou alterado enquanto o arquivo era lido
+                cached = self.library.peek(name, entry)
+                if cached is not None:
+                    return cached
+                self.library.remember(name, body)
+                self.library.seen(entry["file"], signature)
+        return body
+
+    def _store_profile(self, name, body):
+        index = self.config["profile_index"]
+        entry = index_entry(index[name]["file"], body)
+        index[name] = entry
+        self._dirty_profiles[name] = entry
+        self.library.store(name, entry, body)
+
     # Métodos de Gerenciamento de Perfil
 
     def get_profile_names(self):
-        return list(self.config["profiles"].keys())
+        return list(self.config["profile_index"].keys())
 
     def get_current_profile_name(self):
         return self.config.get("current_profile", "Default")
 
+    def get_profile_data(self, name):
+        """Dados de um perfil qualquer, completados com os valores padrão (lê o arquivo se preciso)."""
+        profile_data = self._profile_body(name)
+        return {key: profile_data.get(key, self.default_profile_data.get(key)) for key in self.PROFILE_SPECIFIC_KEYS}
+
     def create_profile(self, name):
-        if name in self.config["profiles"]:
-            return False # Já existe
-        # Cria cópia do perfil padrão ou vazio
-        self.config["profiles"][name] = self.default_profile_data.copy()
+        with self._lock:
+            index = self.config["profile_index"]
+            if name in index:
+                return False # Já existe
+            # Cria cópia do perfil padrão ou vazio
+            index[name] = index_entry(self.library.file_for(name, index), self.default_profile_data)
+            self._store_profile(name, self.default_profile_data.copy())
         self.save_config()
         return True
 
     def delete_profile(self, name):
         if name == "Default":
             return False # Não pode deletar o padrão
-        if name in self.config["profiles"]:
-            del self.config["profiles"][name]
+        with self._lock:
+            index = self.config["profile_index"]
+            if name not in index:
+                return False
+            self.library.delete(name, index.pop(name))
+            self._dirty_profiles[name] = None
             # Se deletou o atual, volta para Default
             if self.config["current_profile"] == name:
                 self.config["current_profile"] = "Default"
-            self.save_config()
-            return True
-        return False
+                self._dirty_keys.add("current_profile")
+        self.save_config()
+        return True
 
     def set_active_profile(self, name):
-        if name in self.config["profiles"]:
+        with self._lock:
+            if name not in self.config["profile_index"]:
+                return False
             self.config["current_profile"] = name
-            self.save_config()
-            return True
-        return False
+            self._dirty_keys.add("current_profile")
+        self.save_config()
+        return True
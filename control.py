@@ -0,0 +1,172 @@
+"""Canal local de controle de uma instância em execução.
+
+Windows usa um named pipe; nos outros sistemas, um socket Unix na pasta
+temporária. Cada conexão manda um pedido {"cmd": ..., "args": [...]} e recebe
+{"ok": True, "result": ...} ou {"ok": False, "error": ...}, sempre em JSON
+(send_bytes/recv_bytes): nada recebido pelo canal é desserializado com pickle.
+
+Uso pela linha de comando (com o FN Lock já rodando):
+    python main.py toggle | on | off | status | stats | reload | open | quit
+    python main.py set-profile Jogos
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+
+if sys.platform == "win32":
+    CONTROL_ADDRESS = r"\\.\pipe\fnlock-control"
+    CONTROL_FAMILY = "AF_PIPE"
+else:
+    CONTROL_ADDRESS = os.path.join(tempfile.gettempdir(), f"fnlock-{os.getuid()}.sock")
+    CONTROL_FAMILY = "AF_UNIX"
+
+# Não é segredo: só evita que outro programa local fale com o canal por engano
+CONTROL_AUTHKEY = b"fnlock-control"
+
+# Tamanho máximo de uma mensagem (bytes)
+MAX_MESSAGE = 1 << 20
+
+COMMANDS = ("toggle", "on", "off", "set-profile", "reload", "status", "stats", "open", "quit")
+
+
+def parse_command(argv):
+    """Extrai (comando, argumentos) da linha de comando; flags (--x) são ignoradas."""
+    words = [arg for arg in argv if not arg.startswith("--")]
+    if not words:
+        return None, []
+    return words[0], words[1:]
+
+
+def forward_to_running_instance(argv):
+    """Repassa o comando da linha de comando a uma instância já em execução.
+
+    Retorna o código de saída, ou None se não houver instância (este processo
+    deve então iniciar o FN Lock). Sem comando, pede para abrir a interface.
+    """
+    cmd, args = parse_command(argv)
+    if cmd is not None and cmd not in COMMANDS:
+        print(f"Comando desconhecido: '{cmd}' (use: {', '.join(COMMANDS)})")
+        return 2
+    response = send_command(cmd or "open", args)
+    if response is None:
+        if cmd not in (None, "open"):
+            print("O FN Lock não está em execução")
+            return 1
+        return None
+    if not response["ok"]:
+        print(f"Erro: {response['error']}")
+        return 1
+    if cmd is not None:
+        print(json.dumps(response["result"], indent=2, ensure_ascii=False))
+    return 0
+
+
+def send_command(cmd, args=(), address=CONTROL_ADDRESS):
+    """Envia um comando à instância em execução. Retorna a resposta, ou None se não houver instância."""
+    try:
+        conn = Client(address, CONTROL_FAMILY, authkey=CONTROL_AUTHKEY)
+    except (OSError, EOFError):
+        return None
+    with conn:
+        _send(conn, {"cmd": cmd, "args": list(args)})
+        return _recv(conn)
+
+
+def _send(conn, message):
+    conn.send_bytes(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+def _recv(conn):
+    return json.loads(conn.recv_bytes(MAX_MESSAGE).decode("utf-8"))
+
+
+def engine_commands(keyboard_handler, config, reload):
+    """Comandos comuns ao app com interface e ao daemon."""
+
+    def set_profile(name):
+        if not keyboard_handler.switch_profile(name):
+            raise ValueError(f"perfil inexistente: '{name}'")
+        return name
+
+    def status():
+        # Lido pelo motor, já com os comandos anteriores aplicados
+        return dict(keyboard_handler.status(), profiles=config.get_profile_names())
+
+    return {
+        "toggle": lambda: keyboard_handler.toggle() or keyboard_handler.status()["active"],
+        "on": lambda: keyboard_handler.set_state(True) or True,
+        "off": lambda: keyboard_handler.set_state(False) or False,
+        "set-profile": set_profile,
+        "reload": lambda: reload() or True,
+        "status": status,
+        "stats": keyboard_handler.metrics.snapshot,
+    }
+
+
+class ControlServer:
+    """Atende o canal de controle numa thread própria, um pedido por conexão."""
+
+    def __init__(self, commands=None, address=CONTROL_ADDRESS):
+        self.commands = commands if commands is not None else {}
+        self.address = address
+        self.listener = None
+
+    def open(self):
+        """Reserva o canal, ainda sem atender. Retorna False se não for possível
+        (ex: outra instância já o usa): chamar antes de instalar o hook de teclado."""
+        if CONTROL_FAMILY == "AF_UNIX" and os.path.exists(self.address):
+            if send_command("status", address=self.address) is not None:
+                return False
+            os.unlink(self.address)   # Socket órfão de uma instância que não saiu direito
+        try:
+            self.listener = Listener(self.address, CONTROL_FAMILY, authkey=CONTROL_AUTHKEY)
+        except OSError as e:
+            print(f"Erro ao abrir canal de controle: {e}")
+            return False
+        return True
+
+    def start(self):
+        """Passa a atender os pedidos (abre o canal, se ainda não foi aberto)."""
+        if self.listener is None and not self.open():
+            return False
+        threading.Thread(target=self._serve, daemon=True).start()
+        return True
+
+    def _serve(self):
+        while self.listener is not None:
+            try:
+                conn = self.listener.accept()
+            except OSError:
+                break   # Listener fechado em stop()
+            except Exception as e:
+                print(f"Conexão de controle recusada: {e}")
+                continue
+            with conn:
+                try:
+                    request = _recv(conn)
+                except (OSError, EOFError, ValueError):
+                    continue   # Mensagem cortada, grande demais ou que não é JSON
+                try:
+                    _send(conn, self.handle(request))
+                except (OSError, EOFError):
+                    pass
+
+    def handle(self, request):
+        try:
+            cmd = request["cmd"]
+            args = request.get("args", [])
+            if not isinstance(args, list):
+                raise ValueError("'args' deve ser uma lista")
+            if cmd not in self.commands:
+                raise ValueError(f"comando desconhecido: '{cmd}'")
+            return {"ok": True, "result": self.commands[cmd](*args)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def stop(self):
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            listener.close()
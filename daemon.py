@@ -0,0 +1,73 @@
+"""Modo sem interface (ex: quiosques): só Config e KeyboardHandler.
+
+Sem Tk, bandeja ou overlay; o controle é feito pelo canal local (control.py):
+    python main.py --daemon
+    python main.py status
+"""
+import sys
+import threading
+
+from config import CONFIG_FILE, Config
+from profile_library import PROFILES_DIR
+from keyboard_hook import KeyboardHandler
+from foreground import AppProfileSwitcher, WindowsForegroundProvider
+from metrics import MetricsServer
+from control import ControlServer, engine_commands
+from watcher import FileWatcher
+
+
+class Daemon:
+    def __init__(self, backend=None):
+        # Canal reservado antes do hook (ver MainApp)
+        self.control = ControlServer()
+        if not self.control.open():
+            print("O FN Lock já está em execução (ou o canal de controle está indisponível)")
+            sys.exit(1)
+        self.config = Config()
+        self.keyboard_handler = KeyboardHandler(self.config, backend=backend)
+        self.app_switcher = AppProfileSwitcher(self.config, self.keyboard_handler, WindowsForegroundProvider())
+
+        self.metrics_server = None
+        if self.config.get("metrics_port"):
+            self.metrics_server = MetricsServer(self.keyboard_handler.metrics, self.config.get("metrics_port"))
+
+        commands = engine_commands(self.keyboard_handler, self.config, self.reload)
+        commands["open"] = self._no_gui
+        commands["quit"] = lambda: self._stopped.set() or True
+        self.control.commands = commands
+        self.config_watcher = FileWatcher(CONFIG_FILE, self.reload, folder=PROFILES_DIR)
+        self._stopped = threading.Event()
+
+    def _no_gui(self):
+        raise RuntimeError("o FN Lock está rodando sem interface (--daemon)")
+
+    def reload(self):
+        if self.keyboard_handler.reload_config():
+            self.app_switcher.reload_rules()
+
+    def run(self):
+        """Bloqueia até receber "quit" pelo canal de controle (ou Ctrl+C)."""
+        if not self.control.start():
+            print("Não foi possível abrir o canal de controle")
+        self.config_watcher.start()
+        self.app_switcher.start()
+        if self.metrics_server:
+            self.metrics_server.start()
+        print("FN Lock rodando sem interface")
+        try:
+            # wait com timeout para o Ctrl+C ser atendido também no Windows
+            while not self._stopped.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def stop(self):
+        self.control.stop()
+        self.config_watcher.stop()
+        self.keyboard_handler.stop()
+        self.app_switcher.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.keyboard_handler.metrics.write_file()
+        self.config.flush()
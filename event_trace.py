@@ -0,0 +1,124 @@
+"""Trace dos últimos eventos de teclado, para investigar "seta presa" ou "tecla perdida".
+
+Buffer circular de tamanho fixo, pré-alocado em arrays (colunas): registrar um
+evento é escrever três posições e avançar um índice, sem alocar nada. Os
+nomes de tecla viram índices numa tabela (cada nome novo entra uma vez só) e
+tecla, tipo e decisão vão juntos num único inteiro.
+
+O conteúdo pode ser salvo em JSONL (legível) ou binário compacto (.fntrace).
+"""
+import json
+import os
+import struct
+from array import array
+
+from backends import KEY_DOWN
+
+DEFAULT_TRACE_SIZE = 4096
+TRACE_FILE = "fnlock-trace.jsonl"
+
+# Decisão tomada pelo hook para cada evento
+DECISION_PASSED = 0
+DECISION_REMAPPED = 1
+DECISION_SUPPRESSED = 2
+DECISION_PAUSED = 3
+DECISION_NAMES = ("passed", "remapped", "suppressed", "paused")
+
+TRACE_MAGIC = b"FNLT"
+TRACE_VERSION = 1
+_HEADER = struct.Struct("<4sHII")   # magic, versão, registros, bytes da tabela de nomes
+
+
+class TraceBuffer:
+    """Buffer circular de eventos: (instante, tecla, tipo, decisão, tempo no hook)."""
+
+    def __init__(self, capacity=DEFAULT_TRACE_SIZE):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.durations = array('f', bytes(4 * capacity))
+        self.codes = array('I', bytes(4 * capacity))   # id da tecla << 8 | down << 7 | decisão
+        self.key_ids = {}
+        self.key_names = []
+        self.position = 0
+        self.count = 0
+
+    def record(self, timestamp, name, event_type, decision, duration):
+        key_id = self.key_ids.get(name)
+        if key_id is None:
+            key_id = self._intern(name)
+        i = self.position
+        self.times[i] = timestamp
+        self.durations[i] = duration
+        self.codes[i] = key_id << 8 | (event_type == KEY_DOWN) << 7 | decision
+        i += 1
+        self.position = 0 if i == self.capacity else i
+        if self.count < self.capacity:
+            self.count += 1
+
+    def _intern(self, name):
+        if len(self.key_names) >= 0xFFFFFF:
+            return 0xFFFFFF
+        key_id = len(self.key_names)
+        self.key_names.append(name)
+        self.key_ids[name] = key_id
+        return key_id
+
+    def _order(self):
+        """Índices do registro mais antigo ao mais recente."""
+        start = (self.position - self.count) % self.capacity
+        return [(start + n) % self.capacity for n in range(self.count)]
+
+    def records(self):
+        names = self.key_names
+        for i in self._order():
+            code = self.codes[i]
+            key_id = code >> 8
+            yield {
+                "t": self.times[i],
+                "name": names[key_id] if key_id < len(names) else "?",
+                "type": "down" if code & 0x80 else "up",
+                "decision": DECISION_NAMES[code & 0x7F],
+                "hook_us": round(self.durations[i] * 1e6, 3),
+            }
+
+    def dump(self, path):
+        """Salva o trace: JSONL se o arquivo terminar em .jsonl, senão binário."""
+        tmp_path = path + ".tmp"
+        try:
+            if path.endswith(".jsonl"):
+                with open(tmp_path, "w") as f:
+                    for rec in self.records():
+                        f.write(json.dumps(rec) + "\n")
+            else:
+                self._dump_binary(tmp_path)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Erro ao salvar trace: {e}")
+            return False
+
+    def _dump_binary(self, path):
+        order = self._order()
+        names = json.dumps(self.key_names).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, len(order), len(names)))
+            f.write(names)
+            for column in (self.times, self.durations, self.codes):
+                array(column.typecode, (column[i] for i in order)).tofile(f)
+
+
+def load_binary(path):
+    """Lê um trace binário salvo por TraceBuffer.dump (ordem cronológica)."""
+    with open(path, "rb") as f:
+        magic, version, count, names_size = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"arquivo de trace inválido: {path}")
+        buffer = TraceBuffer(max(count, 1))
+        buffer.key_names = json.loads(f.read(names_size).decode("utf-8"))
+        for column in (buffer.times, buffer.durations, buffer.codes):
+            loaded = array(column.typecode)
+            loaded.fromfile(f, count)
+            column[:count] = loaded
+        buffer.count = count
+        buffer.position = count % buffer.capacity
+    return buffer
@@ -0,0 +1,185 @@
+"""Troca automática de perfil pela janela em primeiro plano.
+
+As regras ficam em `app_rules` no settings.json:
+    {"game.exe": "Jogos", "class:Chrome_WidgetWin_1": "Navegador"}
+(nome do executável, ou "class:" + classe da janela) -> perfil.
+"""
+import threading
+
+CLASS_PREFIX = "class:"
+
+
+class ForegroundProvider:
+    """Fonte de eventos de troca de foco: chama callback(processo, classe_da_janela)."""
+
+    def start(self, callback):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class StaticForegroundProvider(ForegroundProvider):
+    """Fonte local, sem sistema operacional: o foco muda quando `focus` é chamado."""
+
+    def __init__(self):
+        self.callback = None
+
+    def start(self, callback):
+        self.callback = callback
+
+    def focus(self, process, window_class=""):
+        if self.callback:
+            self.callback(process, window_class)
+
+
+class WindowsForegroundProvider(ForegroundProvider):
+    """Escuta EVENT_SYSTEM_FOREGROUND (SetWinEventHook): sem polling, só reage a trocas de foco."""
+
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    WM_QUIT = 0x0012
+
+    def __init__(self):
+        self.callback = None
+        self._thread = None
+        self._thread_id = None
+        self._process_names = {}   # pid -> nome do executável
+
+    def start(self, callback):
+        self.callback = callback
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread_id:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+
+    def _run(self):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        self._thread_id = kernel32.GetCurrentThreadId()
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.GetForegroundWindow.restype = wintypes.HWND
+        kernel32.OpenProcess.restype = wintypes.HANDLE
+
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+
+        def on_event(hook, event, hwnd, id_object, id_child, thread, time):
+            try:
+                self._notify(user32, kernel32, hwnd)
+            except Exception as e:
+                print(f"Erro ao identificar janela em primeiro plano: {e}")
+
+        # Mantém a referência ao callback viva enquanto o hook existir
+        self._proc = WinEventProc(on_event)
+        hook = user32.SetWinEventHook(
+            self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND,
+            0, self._proc, 0, 0, self.WINEVENT_OUTOFCONTEXT)
+        if not hook:
+            print("Aviso: não foi possível monitorar a janela em primeiro plano")
+            return
+
+        # Estado inicial: janela que já está em foco
+        self._notify(user32, kernel32, user32.GetForegroundWindow())
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+        user32.UnhookWinEvent(hook)
+
+    def _notify(self, user32, kernel32, hwnd):
+        import ctypes
+        from ctypes import wintypes
+
+        if not hwnd or not self.callback:
+            return
+        class_buffer = ctypes.create_unicode_buffer(256)
+        user32.GetClassNameW(hwnd, class_buffer, 256)
+
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        process = self._process_names.get(pid.value)
+        if process is None:
+            process = ""
+            handle = kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid.value)
+            if handle:
+                size = wintypes.DWORD(260)
+                path_buffer = ctypes.create_unicode_buffer(size.value)
+                if kernel32.QueryFullProcessImageNameW(handle, 0, path_buffer, ctypes.byref(size)):
+                    process = path_buffer.value.rsplit("\\", 1)[-1].lower()
+                kernel32.CloseHandle(handle)
+            if len(self._process_names) > 512:
+                self._process_names.clear()
+            self._process_names[pid.value] = process
+
+        self.callback(process, class_buffer.value)
+
+
+class AppProfileSwitcher:
+    """Aplica `app_rules`: troca o perfil do KeyboardHandler conforme o app em foco.
+
+    A resolução (processo, classe) -> perfil é guardada em cache, então cada troca
+    de foco custa uma consulta a dicionário; a troca em si reusa os perfis já
+    compilados do KeyboardHandler (só troca a referência, nenhum hook é refeito).
+    Ao sair de um app com regra, volta ao perfil que estava ativo antes.
+    """
+
+    def __init__(self, config, keyboard_handler, provider):
+        self.config = config
+        self.keyboard_handler = keyboard_handler
+        self.provider = provider
+        self.fallback_profile = None
+        self.reload_rules()
+
+    def reload_rules(self):
+        rules = self.config.get("app_rules") or {}
+        self.process_rules = {}
+        self.class_rules = {}
+        for key, profile in rules.items():
+            if key.startswith(CLASS_PREFIX):
+                self.class_rules[key[len(CLASS_PREFIX):]] = profile
+            else:
+                self.process_rules[key.lower()] = profile
+        self._cache = {}
+
+    def start(self):
+        self.provider.start(self.on_foreground_change)
+
+    def stop(self):
+        self.provider.stop()
+
+    def resolve(self, process, window_class):
+        key = (process, window_class)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        profile = self.class_rules.get(window_class) or self.process_rules.get(process)
+        if profile not in self.config.get_profile_names():
+            profile = None
+        self._cache[key] = profile
+        return profile
+
+    def on_foreground_change(self, process, window_class):
+        profile = self.resolve(process, window_class)
+        current = self.config.get_current_profile_name()
+        if profile is None:
+            # Saiu de um app com regra: volta ao perfil anterior
+            if self.fallback_profile is not None:
+                fallback, self.fallback_profile = self.fallback_profile, None
+                if fallback != current:
+                    self.keyboard_handler.switch_profile(fallback)
+            return
+        if self.fallback_profile is None:
+            self.fallback_profile = current
+        if profile != current:
+            self.keyboard_handler.switch_profile(profile)
@@ -4,17 +4,23 @@ import customtkinter as ctk
 import json
 import os
 
+from macros import TEXT_PREFIX, format_destination
+
 class AppGUI:
-    def __init__(self, root, config, startup_manager, on_toggle_request, on_quit_request, on_mapping_change=None):
+    def __init__(self, root, config, startup_manager, on_toggle_request, on_quit_request, on_mapping_change=None,
+                 on_profile_change=None, metrics=None):
         self.root = root
         self.config = config
         self.startup_manager = startup_manager
         self.on_toggle_request = on_toggle_request
         self.on_quit_request = on_quit_request
         self.on_mapping_change = on_mapping_change
+        self.on_profile_change = on_profile_change
+        self.metrics = metrics
+        self.metrics_window = None
         
         self.root.title("FN Lock Simulator")
-        self.root.geometry("350x500") # Increased height for profiles
+        self.root.geometry("350x540") # Increased height for profiles + metrics
         self.root.resizable(False, False)
         
         # Set Window Icon
@@ -85,6 +91,10 @@ class AppGUI:
         self.config_btn = ctk.CTkButton(main_frame, text="Configurar Teclas", command=self._open_key_config, height=40, font=("Arial", 14), fg_color="transparent", border_width=2)
         self.config_btn.pack(fill="x", padx=20, pady=10)
         
+        # Botão Métricas
+        if self.metrics is not None:
+            ctk.CTkButton(main_frame, text="Métricas", command=self._open_metrics, height=28, fg_color="transparent", border_width=1).pack(fill="x", padx=20, pady=(0, 10))
+        
         # Checkbox Startup
         is_registered = self.startup_manager.is_registered()
         self.startup_check = ctk.CTkCheckBox(
@@ -111,13 +121,21 @@ class AppGUI:
         quit_btn.pack(side="bottom", fill="x", padx=20, pady=20)
 
     def _on_profile_change(self, choice):
-        if self.config.set_active_profile(choice):
+        if self.on_profile_change:
+            # Perfis já compilados no KeyboardHandler: a troca é imediata
+            changed = self.on_profile_change(choice)
+        else:
+            changed = self.config.set_active_profile(choice)
+        if changed:
             # Refresh UI elements that depend on profile data
-            self.smart_typing_var.set(self.config.get("smart_typing"))
-            
-            # Notify app to reload hooks
-            if self.on_mapping_change:
-                self.on_mapping_change()
+            # (a troca em si é aplicada pelo motor logo em seguida)
+            self.smart_typing_var.set(self.config.get_profile_data(choice)["smart_typing"])
+
+    def update_profile(self, name):
+        """Atualiza a interface quando o perfil muda por fora (ex: atalho global)."""
+        self.profile_combo.configure(values=self.config.get_profile_names())
+        self.profile_var.set(name)
+        self.smart_typing_var.set(self.config.get("smart_typing"))
 
     def _add_new_profile(self):
         dialog = ctk.CTkInputDialog(text="Nome do novo perfil:", title="Novo Perfil")
@@ -155,6 +173,9 @@ class AppGUI:
                 
                 # Trigger update
                 self._on_profile_change("Default")
+                # Descarta o perfil removido do cache de perfis compilados
+                if self.on_mapping_change:
+                    self.on_mapping_change()
 
     def _on_toggle_click(self):
         # Solicita a mudança de estado
@@ -194,6 +215,219 @@ class AppGUI:
         """Abre a janela de configuração de teclas."""
         KeyConfigWindow(self.root, self.config, self.on_mapping_change)
 
+    def _open_metrics(self):
+        """Abre (ou traz para frente) o painel de métricas."""
+        if self.metrics_window and self.metrics_window.is_open():
+            self.metrics_window.window.lift()
+            return
+        self.metrics_window = MetricsWindow(self.root, self.metrics)
+
+
+class VirtualMappingList(ctk.CTkFrame):
+    """Lista de mapeamentos virtualizada para layouts grandes.
+
+    Só existem widgets para as linhas visíveis; ao rolar, as mesmas linhas
+    são reaproveitadas com outro texto. Adicionar ou remover um mapeamento
+    atualiza apenas as linhas na tela, nunca a lista inteira.
+    """
+    ROW_HEIGHT = 34
+    WHEEL_STEP = 3
+
+    def __init__(self, master, on_remove, label_text="", **kwargs):
+        super().__init__(master, **kwargs)
+        self.on_remove = on_remove
+        self.keys = []      # Ordem de exibição
+        self.values = {}    # src -> dst
+        self.offset = 0     # Índice da primeira linha visível
+        self.visible = 0
+        self.rows = []      # Pool de linhas: [frame, src_label, dst_label, src exibido, dst exibido]
+        
+        if label_text:
+            ctk.CTkLabel(self, text=label_text).pack(fill="x", pady=(5, 0))
+        
+        # Cabeçalho
+        header_frame = ctk.CTkFrame(self, fg_color="transparent")
+        header_frame.pack(fill="x", pady=2)
+        ctk.CTkLabel(header_frame, text="Original", width=100, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="->", width=30).pack(side="left")
+        ctk.CTkLabel(header_frame, text="Nova Função", width=100, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
+        
+        content = ctk.CTkFrame(self, fg_color="transparent")
+        content.pack(fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(content, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.body = ctk.CTkFrame(content, fg_color="transparent")
+        self.body.pack(side="left", fill="both", expand=True)
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+
+    # --- Dados ---
+
+    def set_items(self, key_map):
+        self.keys = list(key_map)
+        self.values = dict(key_map)
+        self.offset = 0
+        self._render()
+
+    def upsert(self, src, dst):
+        if src in self.values:
+            self.values[src] = dst
+            self._render()
+            return
+        self.keys.append(src)
+        self.values[src] = dst
+        # Rola até o fim para mostrar o item recém-adicionado
+        self.scroll_to(len(self.keys))
+
+    def remove(self, src):
+        if src not in self.values:
+            return
+        del self.values[src]
+        self.keys.remove(src)
+        self.scroll_to(self.offset)
+
+    # --- Rolagem ---
+
+    def scroll_to(self, offset):
+        self.offset = max(0, min(offset, len(self.keys) - self.visible))
+        self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(value) * len(self.keys)))
+        elif action == "scroll":
+            step = self.visible if unit == "pages" else 1
+            self.scroll_to(self.offset + int(value) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            delta = -1
+        elif getattr(event, "num", None) == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self.scroll_to(self.offset + delta * self.WHEEL_STEP)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)
+
+    # --- Linhas ---
+
+    def _on_resize(self, event):
+        # event.height vem em pixels reais; ROW_HEIGHT está na escala do CustomTkinter
+        visible = max(1, int(event.height / self._get_widget_scaling()) // self.ROW_HEIGHT)
+        while len(self.rows) < visible:
+            self.rows.append(self._create_row(len(self.rows)))
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(self.offset)
+
+    def _create_row(self, slot):
+        row = ctk.CTkFrame(self.body, height=self.ROW_HEIGHT - 4)
+        src_label = ctk.CTkLabel(row, text="", width=100, anchor="w")
+        src_label.pack(side="left", padx=5)
+        arrow = ctk.CTkLabel(row, text="->", width=30)
+        arrow.pack(side="left")
+        dst_label = ctk.CTkLabel(row, text="", width=100, anchor="w")
+        dst_label.pack(side="left", padx=5)
+        
+        del_btn = ctk.CTkButton(row, text="X", width=30, fg_color="#C0392B", hover_color="#E74C3C",
+                              command=lambda: self._on_remove_click(slot))
+        del_btn.pack(side="right", padx=5)
+        for widget in (row, src_label, arrow, dst_label):
+            self._bind_wheel(widget)
+        return [row, src_label, dst_label, None, None]
+
+    def _on_remove_click(self, slot):
+        index = self.offset + slot
+        if index < len(self.keys):
+            self.on_remove(self.keys[index])
+
+    def _render(self):
+        """Atualiza só as linhas visíveis (e só o texto que mudou)."""
+        total = len(self.keys)
+        for slot, row in enumerate(self.rows):
+            index = self.offset + slot
+            frame = row[0]
+            if slot >= self.visible or index >= total:
+                if row[3] is not None:
+                    frame.place_forget()
+                    row[3] = row[4] = None
+                continue
+            src = self.keys[index]
+            dst = self.values[src]
+            if row[3] is None:
+                frame.place(x=0, y=slot * self.ROW_HEIGHT, relwidth=1)
+            if row[3] != src:
+                row[1].configure(text=src)
+                row[3] = src
+            if row[4] != dst:
+                row[2].configure(text=format_destination(dst))
+                row[4] = dst
+        
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
+class MetricsWindow:
+    """Painel com os contadores do motor e a latência do hook.
+
+    Atualiza a cada REFRESH_MS só enquanto está aberto; fechado, não custa nada.
+    """
+    REFRESH_MS = 1000
+
+    def __init__(self, parent, metrics):
+        self.metrics = metrics
+        self.window = ctk.CTkToplevel(parent)
+        self.window.title("Métricas")
+        self.window.geometry("320x330")
+        self.window.attributes("-topmost", True)
+        self.window.protocol("WM_DELETE_WINDOW", self._close)
+        self._after_id = None
+
+        self.text_label = ctk.CTkLabel(self.window, text="", font=("Consolas", 12), justify="left", anchor="w")
+        self.text_label.pack(fill="both", expand=True, padx=20, pady=(20, 10))
+        ctk.CTkButton(self.window, text="Exportar (.prom)", command=self._export).pack(fill="x", padx=20, pady=(0, 20))
+
+        self._refresh()
+
+    def is_open(self):
+        return self._after_id is not None
+
+    def _refresh(self):
+        m = self.metrics
+        hook = m.hook_seconds
+        avg = hook.sum / hook.count if hook.count else 0.0
+        lines = [
+            f"Eventos vistos:      {m.events_seen.value}",
+            f"Remapeados:          {m.events_remapped.value}",
+            f"Suprimidos:          {m.events_suppressed.value}",
+            f"Eventos sintéticos:  {m.synthetic_events.value}",
+            f"Pausas / retomadas:  {m.pauses.value} / {m.resumes.value}",
+            f"Liga/desliga:        {m.toggles.value}",
+            "",
+            f"Hook médio:  {avg * 1e6:.1f} µs",
+            f"Hook p50:   <= {hook.quantile(0.5) * 1e6:g} µs",
+            f"Hook p99:   <= {hook.quantile(0.99) * 1e6:g} µs",
+        ]
+        self.text_label.configure(text="\n".join(lines))
+        self._after_id = self.window.after(self.REFRESH_MS, self._refresh)
+
+    def _export(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".prom", filetypes=[("Prometheus", "*.prom")])
+        if file_path and self.metrics.write_file(file_path):
+            messagebox.showinfo("Sucesso", "Métricas exportadas com sucesso!")
+
+    def _close(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
+
 
 class KeyConfigWindow:
     def __init__(self, parent, config, on_save_callback):
@@ -229,9 +463,9 @@ class KeyConfigWindow:
         add_btn = ctk.CTkButton(input_frame, text="+", width=40, command=self._add_mapping)
         add_btn.pack(side="left", padx=10)
         
-        # Lista (Scrollable)
-        self.scroll_frame = ctk.CTkScrollableFrame(self.window, label_text="Mapeamentos Atuais")
-        self.scroll_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        # Lista (virtualizada: só as linhas visíveis são widgets)
+        self.mapping_list = VirtualMappingList(self.window, on_remove=self._remove_mapping, label_text="Mapeamentos Atuais")
+        self.mapping_list.pack(fill="both", expand=True, padx=20, pady=10)
         
         # Activation Key Config
         activation_frame = ctk.CTkFrame(self.window)
@@ -258,49 +492,27 @@ class KeyConfigWindow:
         ctk.CTkButton(self.window, text="Salvar e Fechar", command=self._save_and_close).pack(pady=20, padx=20, fill="x")
 
     def _refresh_list(self):
-        # Limpa widgets antigos
-        for widget in self.scroll_frame.winfo_children():
-            widget.destroy()
-            
-        # Cabeçalho
-        header_frame = ctk.CTkFrame(self.scroll_frame, fg_color="transparent")
-        header_frame.pack(fill="x", pady=2)
-        ctk.CTkLabel(header_frame, text="Original", width=100, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header_frame, text="->", width=30).pack(side="left")
-        ctk.CTkLabel(header_frame, text="Nova Função", width=100, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-        
-        # Itens
-        for src, dst in self.key_map.items():
-            self._create_row(src, dst)
-
-    def _create_row(self, src, dst):
-        row = ctk.CTkFrame(self.scroll_frame)
-        row.pack(fill="x", pady=2)
-        
-        ctk.CTkLabel(row, text=src, width=100, anchor="w").pack(side="left", padx=5)
-        ctk.CTkLabel(row, text="->", width=30).pack(side="left")
-        ctk.CTkLabel(row, text=dst, width=100, anchor="w").pack(side="left", padx=5)
-        
-        del_btn = ctk.CTkButton(row, text="X", width=30, fg_color="#C0392B", hover_color="#E74C3C",
-                              command=lambda s=src: self._remove_mapping(s))
-        del_btn.pack(side="right", padx=5)
+        self.mapping_list.set_items(self.key_map)
 
     def _add_mapping(self):
         src = self.src_entry.get().strip().lower()
-        dst = self.dst_entry.get().strip().lower()
+        dst = self.dst_entry.get().strip()
+        # Texto ("text:...") mantém maiúsculas/minúsculas; teclas são normalizadas
+        if not dst.startswith(TEXT_PREFIX):
+            dst = dst.lower()
         
         if not src or not dst:
             return
             
         self.key_map[src] = dst
-        self._refresh_list()
+        self.mapping_list.upsert(src, dst)
         self.src_entry.delete(0, "end")
         self.dst_entry.delete(0, "end")
 
     def _remove_mapping(self, src):
         if src in self.key_map:
             del self.key_map[src]
-            self._refresh_list()
+            self.mapping_list.remove(src)
 
     def _import_json(self):
         filename = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
@@ -1,123 +1,457 @@
-import keyboard
-import threading
-import time
+from time import perf_counter
+
+from backends import KEY_UP
+from metrics import EngineMetrics
+from event_trace import (DECISION_PASSED, DECISION_PAUSED, DECISION_REMAPPED, DECISION_SUPPRESSED,
+                         DEFAULT_TRACE_SIZE, TRACE_FILE, TraceBuffer)
+from macros import MacroPlayer
+from cadence import CadenceModel
+from keymap import (KIND_ACTIVATION, KIND_BY_NAME, KIND_COMBO, KIND_HOTKEY, KIND_IGNORED, KIND_MAPPED,
+                    KIND_MODIFIER, KIND_SEQUENCE, MODIFIER_BITS, MODIFIER_NAMES, ProfileCache,
+                    compile_hotkeys, diff_key_maps)
+
+# Segundos de silêncio até o Smart Typing retomar o remapeamento (modo fixo;
+# no modo adaptativo o CadenceModel ajusta esse tempo ao ritmo de quem digita)
+RESUME_DELAY = 1.0
+
+# Tempo máximo (s) entre as teclas de uma sequência (ex: ";, g, d")
+SEQUENCE_TIMEOUT = 1.0
+
+# Tipos de tecla que podem ter o KEY_DOWN suprimido (o resto sempre passa)
+KIND_MAY_SUPPRESS = KIND_MAPPED | KIND_COMBO | KIND_HOTKEY | KIND_SEQUENCE
 
 class KeyboardHandler:
-    def __init__(self, config, on_toggle_callback=None, on_pause_callback=None):
+    def __init__(self, config, on_toggle_callback=None, on_pause_callback=None, backend=None,
+                 on_profile_callback=None):
         self.config = config
+        if backend is None:
+            from backends import KeyboardBackend
+            backend = KeyboardBackend()
+        self.backend = backend
+        # Thread do motor: dona de todo o estado abaixo (eventos, timers e
+        # mudanças vindas da GUI, bandeja, watcher e canal de controle)
+        self.engine = backend.scheduler
         self.active = self.config.get("fn_lock_active")
-        self.smart_typing = self.config.get("smart_typing")
         
         self.on_toggle_callback = on_toggle_callback
         self.on_pause_callback = on_pause_callback
+        self.on_profile_callback = on_profile_callback
+        self.metrics = EngineMetrics()
+        
+        # Trace circular dos últimos eventos (trace_size = 0 desliga)
+        trace_size = self.config.get("trace_size")
+        if trace_size is None:
+            trace_size = DEFAULT_TRACE_SIZE
+        self.trace = TraceBuffer(trace_size) if trace_size > 0 else None
         
-        self.remap_hooks = []
-        self.activation_hooks = [] # Store activation hooks to remove them later
-        self.key_map = self.config.get("key_map")
+        self.event_slot = self.backend.event_slot
+        self.player = MacroPlayer(self.backend)
+        self._compile_profiles()
+        self.pending_profile = None  # Perfil sendo carregado fora do motor para uma troca
+        self.held_modifiers = 0      # Máscara de bits (MODIFIER_BITS)
+        # Teclas físicas (slot, ou nome sem slot) com estado entre o KEY_DOWN e o KEY_UP
+        self.suppressed_keys = set() # Teclas cujo KEY_DOWN foi suprimido (suprime o KEY_UP também)
+        self.held_remaps = {}        # Origem segurada -> HoldPlan do destino pressionado por nós
         
         # Smart Typing State
         self.paused = False
+        self.pause_started = 0
         self.last_typing_time = 0
         self.running = True
+        self.resume_timer = None
+        self.cadence = CadenceModel() if self.config.get("adaptive_smart_typing") else None
         
-        # Monitor Thread for Smart Typing
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
-        
-        # Global hook to detect typing
-        keyboard.hook(self._global_hook)
+        # Estado do casamento de sequências (trie percorrida tecla a tecla)
+        self.seq_node = None        # Nó atual da trie (None = fora de sequência)
+        self.seq_buffer = []        # Teclas consumidas, reenviadas se a sequência falhar
+        self.seq_timer = None
         
-        # Inicia hooks de ativação
-        self._setup_activation_hooks()
+        # Eventos entregues ao motor / já processados por ele. Cada contador tem
+        # um único escritor (hook e motor), então dispensam lock.
+        self.events_posted = 0
+        self.events_done = 0
         
-        # Se já estiver ativo na config, aplica os hooks
-        if self.active:
-            self._apply_hooks()
-
-    def _setup_activation_hooks(self):
-        """Configura os hooks para a tecla de ativação."""
-        # Remove old hooks if any
-        for hook in self.activation_hooks:
-            try:
-                keyboard.unhook(hook)
-            except:
-                pass
-        self.activation_hooks.clear()
-
-        activation_key = self.config.get("activation_key")
-        if not activation_key:
-            activation_key = "right alt"
-            
-        keys_to_hook = [activation_key]
+        # Hook único: remapeamento, ativação e Smart Typing passam todos por aqui.
+        # Ligar, desligar ou pausar é só trocar flags, nenhum hook é refeito.
+        # Os eventos que nós mesmos injetamos o backend filtra antes de chegar aqui.
+        self.hook = self.backend.hook(self._global_hook)
+
+    def _global_hook(self, event):
+        """Hook único: decide se o evento passa (True) ou é suprimido (False).
+
+        Roda na thread do teclado, que não toca no estado: um evento que com
+        certeza passa é só enfileirado para o motor (decisão O(1)); os demais
+        esperam o motor decidir. Tarefas já na fila (ex: ligar o lock) podem
+        rodar antes do evento enfileirado: por isso ele vai marcado como já
+        entregue, e o motor não o suprime nem remapeia.
+        """
+        posted = self.events_posted
+        self.events_posted = posted + 1
+        # Só com o motor ocioso (nenhum evento anterior pendente) o estado pode
+        # ser lido daqui: o evento passa direto se nada nele pode ser suprimido
+        if posted == self.events_done:
+            slot = self.event_slot(event)
+            key = slot or event.name
+            # Tecla segurada cujo KEY_DOWN foi suprimido ou remapeado: o KEY_UP
+            # e o auto-repeat dela são decididos pelo motor, mesmo que o lock
+            # ou o perfil tenham mudado desde então
+            passes = key not in self.suppressed_keys and key not in self.held_remaps
+            if passes and event.event_type != KEY_UP:
+                keymap = self.keymap
+                kind = keymap.slot_kinds[slot]
+                if kind == KIND_BY_NAME:
+                    kind = keymap.kinds.get(event.name, 0)
+                passes = self.seq_node is None and not (
+                    kind & KIND_MAY_SUPPRESS and (self.active or kind != KIND_MAPPED))
+            if passes:
+                self.engine.post(self._handle_event, event, True)
+                return True
+        return self.engine.call(self._handle_event, event)
+
+    def _handle_event(self, event, passed_through=False):
+        """Processa um evento na thread do motor, com métricas e trace.
+
+        passed_through=True: o hook já deixou o evento passar (só atualiza o estado).
+        """
+        start = perf_counter()
+        metrics = self.metrics
+        remapped = metrics.events_remapped.value
+        passed = self._process_event(event, passed_through) or passed_through
+        elapsed = perf_counter() - start
+        metrics.events_seen.inc()
+        if not passed:
+            metrics.events_suppressed.inc()
+        metrics.hook_seconds.observe(elapsed)
         
-        # Compatibilidade com ABNT2 (Alt Gr muitas vezes é identificado separado)
-        if activation_key == "right alt":
-            keys_to_hook.append("alt gr")
-            
-        for key in keys_to_hook:
-            try:
-                # Usa suppress=False para não bloquear a tecla original (opcional, mas seguro para Alt)
-                hook = keyboard.on_release_key(key, self._on_activation_key)
-                self.activation_hooks.append(hook)
-            except Exception as e:
-                print(f"Aviso: Não foi possível hookar a tecla '{key}': {e}")
+        trace = self.trace
+        if trace is not None:
+            if not passed:
+                decision = DECISION_REMAPPED if metrics.events_remapped.value != remapped else DECISION_SUPPRESSED
+            elif self.paused and self.active:
+                decision = DECISION_PAUSED
+            else:
+                decision = DECISION_PASSED
+            trace.record(event.time, event.name, event.event_type, decision, elapsed)
+        self.events_done += 1
+        return passed
 
-    def _on_activation_key(self, event):
-        self.toggle()
+    def _process_event(self, event, passed_through=False):
+        # Uma única leitura do snapshot: uma troca concorrente não afeta este evento
+        keymap = self.keymap
+        # Uma indexação pelo slot (scan code) do evento; o nome do evento só é
+        # usado nos slots que o keymap não resolveu
+        slot = self.event_slot(event)
+        kind = keymap.slot_kinds[slot]
+        if kind == KIND_BY_NAME:
+            name = event.name   # Os backends entregam nomes já em minúsculas
+            kind = keymap.kinds.get(name, 0)
+        else:
+            name = keymap.slot_names[slot]
+        # Identifica a tecla física entre o KEY_DOWN e o KEY_UP (independe do perfil)
+        key = slot or event.name
 
-    def _global_hook(self, event):
-        """Detecta digitação para o Smart Typing."""
-        if event.event_type == keyboard.KEY_DOWN:
-            # Ignora teclas modificadoras e a própria tecla de ativação
-            ignored_keys = ['right alt', 'alt', 'ctrl', 'shift', 'caps lock', 'alt gr', 'left alt', 'right ctrl', 'left ctrl']
-            
-            # Adiciona a tecla de ativação atual à lista de ignorados
-            current_activation = self.config.get("activation_key")
-            if current_activation and current_activation not in ignored_keys:
-                ignored_keys.append(current_activation)
+        if event.event_type == KEY_UP:
+            if kind:
+                if kind & KIND_MODIFIER:
+                    self.held_modifiers &= ~MODIFIER_BITS[name]
+                if kind & KIND_ACTIVATION:
+                    self._toggle()
+            if self.held_remaps and key in self.held_remaps:
+                # Solta o destino mesmo que o lock/perfil tenha mudado nesse meio tempo
+                self._release_held(key)
+                return False
+            if self.suppressed_keys and key in self.suppressed_keys:
+                self.suppressed_keys.discard(key)
+                return False
+            return True
+
+        if kind & KIND_MODIFIER:
+            self.held_modifiers |= MODIFIER_BITS[name]
+
+        if self.held_remaps and key in self.held_remaps:
+            # Auto-repeat de uma origem segurada: repete o destino, sem novo toque
+            # (mesmo que o lock/perfil tenha mudado desde o KEY_DOWN)
+            hold = self.held_remaps[key]
+            self.metrics.events_remapped.inc()
+            self.metrics.synthetic_events.inc()
+            self.backend.inject(hold.repeat)
+            return False
+
+        if passed_through:
+            # O sistema já recebeu a tecla: só o Smart Typing acompanha
+            if not kind & KIND_IGNORED:
+                self._track_typing(keymap, kind)
+            return True
+
+        if self.seq_node is not None or kind & KIND_SEQUENCE:
+            pending = self.seq_node is not None
+            if self._match_sequence(keymap, name, key):
+                return False
+            if pending:
+                if self._process_key_down(keymap, kind, name, key):
+                    # Tecla que quebrou a sequência: vai depois das teclas devolvidas,
+                    # na ordem digitada (o KEY_UP físico passa normalmente)
+                    self.metrics.synthetic_events.inc()
+                    self.backend.press(event.name)
+                return False
+
+        return self._process_key_down(keymap, kind, name, key)
 
-            if event.name.lower() in ignored_keys:
-                return
+    def _process_key_down(self, keymap, kind, name, key):
+        """KEY_DOWN fora de sequência: combinações, Smart Typing e remapeamento."""
+        if self.held_modifiers and kind & (KIND_HOTKEY | KIND_COMBO):
+            if self._dispatch_combo(keymap, kind, name, key):
+                return False
 
-            # Se for uma tecla mapeada, e o lock estiver ATIVO e NÃO PAUSADO, ignoramos (é remapeamento)
-            # Mas se estiver pausado, é digitação normal.
-            is_mapped = event.name.lower() in self.key_map
+        # Detecta digitação para o Smart Typing.
+        # Ignora teclas modificadoras e a própria tecla de ativação (mas elas
+        # ainda podem ser remapeadas, ex: caps lock -> esc)
+        if kind & KIND_IGNORED:
+            if kind & KIND_MAPPED and self.active and not self.paused:
+                if not self._dispatch(keymap, name, key):
+                    if kind & KIND_MODIFIER:
+                        # O sistema não vê o modificador: não vale para combinações
+                        self.held_modifiers &= ~MODIFIER_BITS[name]
+                    return False
+            return True
+
+        if self._track_typing(keymap, kind) or not self.active:
+            return True
+
+        return self._dispatch(keymap, name, key)
+
+    def _track_typing(self, keymap, kind):
+        """Smart Typing: registra a tecla e pausa/retoma. Retorna True se ela passa como digitação."""
+        # Modo adaptativo: o modelo de cadência vê toda tecla e decide se uma
+        # tecla fora do mapa é digitação de verdade ou só uma tecla solta no jogo
+        cadence = self.cadence
+        typing = True
+        if cadence is not None and keymap.smart_typing:
+            typing = cadence.observe(self.backend.now(), bool(kind & KIND_MAPPED))
+        
+        # Se for uma tecla mapeada, e o lock estiver ATIVO e NÃO PAUSADO, ignoramos (é remapeamento)
+        # Mas se estiver pausado, é digitação normal.
+        if not kind & KIND_MAPPED:
+            # É uma tecla de digitação (não mapeada)
+            self.last_typing_time = self.backend.now()
             
-            if not is_mapped:
-                # É uma tecla de digitação (não mapeada)
-                self.last_typing_time = time.time()
-                
-                if self.active and self.smart_typing and not self.paused:
-                    self.paused = True
-                    self._remove_hooks()
-                    if self.on_pause_callback:
-                        self.on_pause_callback(True)
-                        
-            elif is_mapped and self.paused:
+            if self.active and keymap.smart_typing and not self.paused and typing:
+                self.paused = True
+                self.pause_started = self.last_typing_time
+                self.metrics.pauses.inc()
+                self._schedule_resume()
+                if self.on_pause_callback:
+                    self.on_pause_callback(True)
+            return True
+                    
+        if self.paused:
+            if cadence is not None and keymap.smart_typing and cadence.gaming:
+                # Várias teclas mapeadas seguidas: voltou a jogar, retoma já
+                self._cancel_resume()
+                self._resume()
+            else:
                 # Se é uma tecla mapeada, MAS estamos pausados, conta como digitação contínua
                 # Ex: estou digitando "water", o 'w' é mapeado, mas como estou pausado, ele é texto.
-                self.last_typing_time = time.time()
-
-    def _monitor_loop(self):
-        """Verifica se deve retomar o bloqueio após pausa."""
-        while self.running:
-            if self.paused and self.active:
-                if time.time() - self.last_typing_time > 1.0: # 1 segundo de silêncio
-                    self.paused = False
-                    self._apply_hooks()
-                    if self.on_pause_callback:
-                        self.on_pause_callback(False)
-            time.sleep(0.1)
+                self.last_typing_time = self.backend.now()
+                return True
+        return False
+
+    def _match_sequence(self, keymap, name, key):
+        """Avança a trie de sequências com a tecla. Retorna True se a tecla foi consumida."""
+        if not self.active or self.paused:
+            return False
+        
+        node = self.seq_node if self.seq_node is not None else keymap.sequences
+        child = node.get(name)
+        if child is None:
+            if self.seq_node is None:
+                return False
+            # Prefixo que não casou: devolve as teclas consumidas e trata esta normalmente
+            self._fail_sequence()
+            child = keymap.sequences.get(name)
+            if child is None:
+                return False
+        
+        self.suppressed_keys.add(key)
+        self._cancel_sequence_timer()
+        if isinstance(child, dict):
+            self.seq_node = child
+            self.seq_buffer.append(name)
+            self.seq_timer = self.backend.scheduler.call_later(SEQUENCE_TIMEOUT, self._fail_sequence)
+        else:
+            self._reset_sequence()
+            self._play(child)
+        return True
+
+    def _fail_sequence(self):
+        """Sequência interrompida (tecla errada ou timeout): reenvia as teclas consumidas."""
+        buffer = self.seq_buffer
+        self._reset_sequence()
+        for name in buffer:
+            # Reenviadas pelo backend: não voltam ao handler (tabela de marcas)
+            self.metrics.synthetic_events.inc(2)
+            self.backend.send(name)
+
+    def _reset_sequence(self):
+        self._cancel_sequence_timer()
+        self.seq_node = None
+        self.seq_buffer = []
+
+    def _cancel_sequence_timer(self):
+        if self.seq_timer:
+            self.seq_timer.cancel()
+            self.seq_timer = None
+
+    def _dispatch_combo(self, keymap, kind, name, key):
+        """Atalhos globais e combinações do perfil. Retorna True se o evento foi consumido."""
+        if kind & KIND_HOTKEY:
+            step = self.hotkeys[name].get(self.held_modifiers)
+            if step is not None:
+                self.suppressed_keys.add(key)
+                self._cycle_profile(step)
+                return True
+
+        if kind & KIND_COMBO and self.active and not self.paused:
+            plan = keymap.combos[name].get(self.held_modifiers)
+            if plan is not None:
+                self.suppressed_keys.add(key)
+                self._play_without_modifiers(plan)
+                return True
+
+        # Não é combinação conhecida: segue como tecla comum
+        return False
+
+    def _dispatch(self, keymap, name, key):
+        """Executa o remapeamento da tecla, se houver. Retorna False para suprimir o original."""
+        plan = keymap.remaps.get(name)
+        if plan is None:
+            return True
+        self.suppressed_keys.add(key)
+        hold = plan.hold
+        if hold is None:
+            self._play(plan)
+            return False
+        # Tecla simples: o destino fica pressionado até a origem ser solta
+        self.held_remaps[key] = hold
+        self.metrics.events_remapped.inc()
+        self.metrics.synthetic_events.inc(hold.key_count)
+        self.backend.inject(hold.press)
+        return False
+
+    def _release_held(self, key):
+        hold = self.held_remaps.pop(key)
+        self.suppressed_keys.discard(key)
+        self.metrics.synthetic_events.inc(hold.key_count)
+        self.backend.inject(hold.release)
+
+    def _release_all_held(self):
+        for key in list(self.held_remaps):
+            self._release_held(key)
+
+    def _play(self, plan):
+        self.metrics.events_remapped.inc()
+        self.metrics.synthetic_events.inc(plan.event_count)
+        self.player.play(plan)
+
+    def _play_without_modifiers(self, plan):
+        """Executa o destino de uma hotkey sem os modificadores físicos que a dispararam."""
+        held = [mod for mod, bit in MODIFIER_NAMES if self.held_modifiers & bit]
+        self.metrics.synthetic_events.inc(2 * len(held))
+        for mod in held:
+            self.backend.release(mod)
+        self._play(plan)
+        for mod in held:
+            self.backend.press(mod)
+
+    def _resume_delay(self):
+        return self.cadence.resume_delay if self.cadence is not None else RESUME_DELAY
+
+    def _schedule_resume(self):
+        """Agenda a retomada para o atraso de retomada após a última tecla digitada."""
+        self.resume_timer = self.backend.scheduler.call_at(
+            self.last_typing_time + self._resume_delay(), self._check_resume)
+
+    def _cancel_resume(self):
+        if self.resume_timer:
+            self.resume_timer.cancel()
+            self.resume_timer = None
+
+    def _check_resume(self):
+        """Retoma o bloqueio após a pausa, ou reagenda se houve digitação nesse meio tempo."""
+        self.resume_timer = None
+        if not (self.running and self.paused and self.active):
+            return
+        # Digitação durante a pausa só atualiza last_typing_time; o timer é
+        # reagendado aqui, uma vez, em vez de a cada tecla.
+        # Mesma conta do agendamento: um timer vencido na hora exata não é reagendado para ela
+        if self.backend.now() < self.last_typing_time + self._resume_delay():
+            self._schedule_resume()
+            return
+        self._resume()
+
+    def _resume(self):
+        self.paused = False
+        self.metrics.resumes.inc()
+        self.metrics.pause_seconds.observe(self.backend.now() - self.pause_started)
+        if self.on_pause_callback:
+            self.on_pause_callback(False)
+
+    # --- Chamadas de outras threads (GUI, bandeja, watcher, canal de controle) ---
+    # Só enfileiram a mudança para o motor e voltam na hora: a thread do
+    # Tkinter nunca espera o motor (que pode estar chamando callbacks da UI).
 
     def toggle(self):
+        self.engine.post(self._toggle)
+
+    def set_state(self, state):
+        self.engine.post(self._set_state, state)
+
+    def switch_profile(self, name):
+        """Troca o perfil ativo. Retorna False se o perfil não existe."""
+        if name not in self.config.get_profile_names():
+            return False
+        self._post_switch(name)
+        return True
+
+    def cycle_profile(self, step=1):
+        self.engine.post(self._cycle_profile, step)
+
+    def update_config(self):
+        # Recompila aqui o perfil editado; o motor só troca a referência
+        name = self.config.get_current_profile_name()
+        profiles = self.profiles
+        token = profiles.token
+        self.engine.post(self._update_config, profiles.compile(name), token)
+
+    def _post_switch(self, name, pending=False):
+        """Lê e compila o perfil nesta thread (se ainda não estiver compilado) e pede a troca ao motor."""
+        profiles = self.profiles
+        keymap = token = None
+        if profiles.peek(name) is None:
+            token = profiles.token
+            keymap = profiles.compile(name)
+        self.engine.post(self._switch_profile, name, keymap, token, pending)
+
+    def status(self):
+        """Estado atual, lido pelo motor (depois das mudanças já enfileiradas).
+
+        Espera o motor: não chamar da thread do Tkinter.
+        """
+        return self.engine.call(lambda: {
+            "active": self.active,
+            "paused": self.paused,
+            "profile": self.config.get_current_profile_name(),
+        })
+
+    # --- Thread do motor ---
+
+    def _toggle(self):
         self.active = not self.active
+        self.metrics.toggles.inc()
         self.config.set("fn_lock_active", self.active)
         self.paused = False # Reset pause on toggle
-        
-        if self.active:
-            self._apply_hooks()
-        else:
-            self._remove_hooks()
+        self._cancel_resume()
+        self._reset_sequence()
             
         if self.on_toggle_callback:
             self.on_toggle_callback(self.active)
@@ -126,78 +460,175 @@ class KeyboardHandler:
         if self.on_pause_callback:
             self.on_pause_callback(False)
 
-    def set_state(self, state):
+    def _set_state(self, state):
         if self.active != state:
-            self.toggle()
+            self._toggle()
 
-    def update_config(self):
-        """Recarrega configurações (mapeamento e smart typing)."""
-        was_active = self.active
-        
-        if was_active:
-            self._remove_hooks()
-            
-        self.key_map = self.config.get("key_map")
-        self.smart_typing = self.config.get("smart_typing")
-        
-        # Atualiza hooks de ativação também
-        self._setup_activation_hooks()
-        
-        if was_active:
-            self._apply_hooks()
+    def _switch_profile(self, name, keymap=None, token=None, pending=False):
+        """Troca o perfil ativo: é só trocar a referência para o perfil compilado.
+
+        `keymap` é o perfil compilado fora do motor, se ainda não estava no cache.
+        Se mesmo assim o perfil não está no cache (foi descartado ou invalidado
+        enquanto compilava), a leitura volta para fora do motor e a troca espera.
+        `pending` marca as trocas carregadas por _load_profile: se outra troca
+        veio depois, esta só guarda o perfil compilado.
+        """
+        if keymap is not None:
+            self.profiles.store(name, keymap, token)
+        if pending and self.pending_profile != name:
+            return False
+        self.pending_profile = None
+        if name not in self.config.get_profile_names():
+            return False
+        if self.profiles.peek(name) is None:
+            self._load_profile(name)
+            return True
+        if not self.config.set_active_profile(name):
+            return False
+        self.keymap = self.profiles.get(name)
+        if self.on_profile_callback:
+            self.on_profile_callback(name)
+        return True
+
+    def _load_profile(self, name):
+        """Lê e compila o perfil fora do motor; a troca chega depois por _switch_profile."""
+        self.pending_profile = name
+        self.engine.background(self._post_switch, name, True)
 
-    def _apply_hooks(self):
-        if self.remap_hooks:
+    def _cycle_profile(self, step=1):
+        """Vai para o próximo (step=1) ou anterior (step=-1) perfil da lista.
+
+        Com uma troca ainda carregando, anda a partir dela: apertar o atalho
+        várias vezes seguidas avança um perfil por vez.
+        """
+        names = self.config.get_profile_names()
+        current = self.pending_profile
+        if current not in names:
+            current = self.config.get_current_profile_name()
+        index = names.index(current) if current in names else 0
+        name = names[(index + step) % len(names)]
+        if self.profiles.peek(name) is None:
+            # Ainda não compilado: o hook está esperando o motor, então o
+            # arquivo é lido e compilado fora dele e a troca vem depois
+            self._load_profile(name)
             return
+        self._switch_profile(name)   # Troca imediata: a que estava carregando fica para trás
+
+    def _update_config(self, keymap, token):
+        """Recarrega configurações do perfil atual (mapeamento, ativação e smart typing)."""
+        profiles = self.profiles
+        fresh = token is profiles.token   # Nada foi invalidado enquanto compilava
+        profiles.prune(self.config.get_profile_names())
+        profiles.invalidate(keymap.name)
+        if fresh:
+            profiles.store(keymap.name, keymap)
+        self.keymap = profiles.get(self.config.get_current_profile_name())
 
+    def _compile_profiles(self, plans=None):
+        # Atalhos globais (valem em qualquer estado) e o cache de perfis compilados
+        self.hotkeys = compile_hotkeys({
+            self.config.get("profile_next_hotkey"): 1,
+            self.config.get("profile_prev_hotkey"): -1,
+        })
+        backend = self.backend
+        self.profiles = ProfileCache(self.config, backend.compile_batch, self.hotkeys.keys(), plans,
+                                     backend.key_slots if backend.resolves_slots else None, backend.shared_slots,
+                                     self.config.get("profile_cache_size"))
+        
+        # Snapshot compilado do perfil atual (trocar de perfil = trocar a referência)
+        self.keymap = self.profiles.get(self.config.get_current_profile_name())
+
+    def reload_config(self):
+        """Relê o settings.json e aplica só o que mudou. Retorna True se algo mudou.
+
+        Leitura e validação rodam na thread de quem chama (watcher ou canal de
+        controle); a recompilação, no motor. Um arquivo inválido
+        mantém a config atual. Só os perfis cujo hash mudou no índice, ou
+        cujo arquivo foi editado por fora, são relidos da pasta profiles/.
+        """
         try:
-            for src, dst in self.key_map.items():
-                # Verifica se é uma combinação (tem '+') ou tecla simples
-                if '+' in src:
-                    # É uma hotkey (ex: ctrl+b)
-                    try:
-                        # add_hotkey retorna um handler (função) que pode ser removido depois
-                        # Usamos suppress=True para bloquear o original
-                        hook = keyboard.add_hotkey(src, self._make_hotkey_callback(dst), suppress=True)
-                        self.remap_hooks.append(('hotkey', hook))
-                    except Exception as e:
-                        print(f"Erro ao adicionar hotkey '{src}': {e}")
-                else:
-                    # É uma tecla simples
-                    try:
-                        hook = keyboard.on_press_key(src, self._make_callback(dst), suppress=True)
-                        self.remap_hooks.append(('key', hook))
-                    except Exception as e:
-                        print(f"Erro ao adicionar hook para '{src}': {e}")
-                        
+            data = self.config.read_config_file(validate=True, skip_own_write=True)
+            if data is None:
+                # O settings.json é o que o próprio app gravou: só os arquivos
+                # de perfil podem ter mudado
+                data = self.config.snapshot()
+            changed = self.config.changed_profiles(data)
+            bodies, signatures = self.config.read_profiles(data, changed, validate=True)
         except Exception as e:
-            print(f"Erro ao aplicar hooks: {e}")
+            print(f"settings.json inválido, mantendo a configuração atual: {e}")
+            return False
+        if data == self.config.config and not changed:
+            if self.config.migrated:
+                self.config.finish_migration()   # Mesmo conteúdo: só grava no formato com índice
+            return False   # Nada mudou
+        names = self.config.get_profile_names()
+        old_key_maps = {name: self.config.get_profile_data(name)["key_map"]
+                        for name in (data["current_profile"], self.config.get_current_profile_name())
+                        if name in names}
+        # A config troca já (quem chama relê as regras de app em seguida); os
+        # perfis compilados, no motor
+        old = self.config.replace(data, bodies, signatures)
+        if self.config.migrated:
+            self.config.finish_migration()   # Grava os perfis e o settings.json já no formato com índice
+        name = self.config.get_current_profile_name()
+        key_map_changes = diff_key_maps(old_key_maps.get(name), self.config.get_profile_data(name)["key_map"])
+        # O perfil atual é compilado aqui; os outros, quando forem usados. Se
+        # os atalhos globais mudaram, o motor recompila tudo (caso raro).
+        keymap = token = None
+        compiled_before = self.profiles.plans.compiled
+        if not self._hotkeys_changed(old, data):
+            profiles = self.profiles
+            token = profiles.token
+            keymap = profiles.compile(name)
+        self.engine.post(self._apply_config, old, data, changed, key_map_changes, compiled_before, keymap, token)
+        return True
 
-    def _make_callback(self, dst_key):
-        return lambda e: keyboard.send(dst_key)
+    def _hotkeys_changed(self, old, data):
+        return any(old.get(key) != data.get(key) for key in ("profile_next_hotkey", "profile_prev_hotkey"))
+
+    def _apply_config(self, old, data, changed, key_map_changes, compiled_before, keymap=None, token=None):
+        fresh = token is self.profiles.token   # Nada foi invalidado enquanto compilava
+        if self._hotkeys_changed(old, data):
+            # Atalhos globais entram na classificação de todos os perfis
+            self._compile_profiles(self.profiles.plans)
+        else:
+            self.profiles.prune(data["profile_index"])
+            for name in changed:
+                self.profiles.invalidate(name)
         
-    def _make_hotkey_callback(self, dst_key):
-        # Callback para hotkeys não recebe evento 'e'
-        return lambda: keyboard.send(dst_key)
-
-    def _remove_hooks(self):
-        for hook_type, hook_obj in self.remap_hooks:
-            try:
-                if hook_type == 'key':
-                    keyboard.unhook(hook_obj)
-                elif hook_type == 'hotkey':
-                    keyboard.remove_hotkey(hook_obj)
-            except Exception as e:
-                print(f"Erro ao remover hook: {e}")
-        self.remap_hooks.clear()
+        name = self.config.get_current_profile_name()
+        if keymap is not None and fresh and keymap.name == name:
+            self.profiles.store(name, keymap)
+        self.keymap = self.profiles.get(name)
+        self._reset_sequence()
+        if bool(data.get("adaptive_smart_typing")) != (self.cadence is not None):
+            self.cadence = CadenceModel() if data.get("adaptive_smart_typing") else None
+        
+        changed, removed = key_map_changes
+        print(f"settings.json recarregado: perfil '{name}' com {len(changed)} mapeamento(s) novo(s) ou alterado(s), "
+              f"{len(removed)} removido(s); {self.profiles.plans.compiled - compiled_before} destino(s) compilado(s)")
+        
+        self._set_state(self.config.get("fn_lock_active"))
+        if self.on_profile_callback:
+            self.on_profile_callback(name)
+
+    def dump_trace(self, path=TRACE_FILE):
+        """Salva os últimos eventos do trace (JSONL ou binário, pela extensão)."""
+        if self.trace is None:
+            print("Trace desligado (trace_size = 0)")
+            return False
+        return self.trace.dump(path)
 
     def stop(self):
+        try:
+            self.backend.unhook(self.hook)
+        except:
+            pass
+        self.engine.post(self._shutdown)
+        self.backend.stop()
+
+    def _shutdown(self):
         self.running = False
-        self._remove_hooks()
-        # Remove activation hooks
-        for hook in self.activation_hooks:
-            try:
-                keyboard.unhook(hook)
-            except:
-                pass
-        keyboard.unhook_all()
+        self._cancel_resume()
+        self._reset_sequence()
+        self._release_all_held()
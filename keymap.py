@@ -0,0 +1,350 @@
+import json
+from array import array
+from collections import OrderedDict
+from types import MappingProxyType
+
+from macros import compile_macro
+
+# Teclas que nunca contam como digitação para o Smart Typing
+IGNORED_KEYS = frozenset(['right alt', 'alt', 'ctrl', 'shift', 'caps lock', 'alt gr', 'left alt', 'right ctrl', 'left ctrl'])
+
+# Bit de cada modificador usado nas combinações (ex: "ctrl+b")
+MODIFIER_BITS = {
+    'ctrl': 1, 'left ctrl': 1, 'right ctrl': 1,
+    'shift': 2, 'left shift': 2, 'right shift': 2,
+    'alt': 4, 'left alt': 4, 'right alt': 4, 'alt gr': 4,
+    'windows': 8, 'left windows': 8, 'right windows': 8,
+}
+MODIFIER_NAMES = (('ctrl', 1), ('shift', 2), ('alt', 4), ('windows', 8))
+
+DEFAULT_ACTIVATION_KEY = "right alt"
+
+# Classificação de cada tecla no snapshot (bits combináveis)
+KIND_IGNORED = 1
+KIND_MAPPED = 2
+KIND_ACTIVATION = 4
+KIND_MODIFIER = 8
+KIND_COMBO = 16     # Última tecla de uma combinação do perfil (ex: "b" em "ctrl+b")
+KIND_HOTKEY = 32    # Última tecla de um atalho global (ex: trocar de perfil)
+KIND_SEQUENCE = 64  # Primeira tecla de uma sequência (ex: ";" em ";, g, d")
+
+# Tabela por slot de tecla: índice = scan code | 0x100 para a variante
+# estendida/numérica (o backend define a conta). O slot 0 é "sem scan code".
+KEY_SLOTS = 512
+NO_SLOT = 0
+KIND_BY_NAME = 255  # Slot sem resolução única: o hook consulta pelo nome do evento
+
+# Tipos que dependem do nome exato da tecla (tabelas indexadas por nome)
+NAMED_KINDS = KIND_MAPPED | KIND_COMBO | KIND_HOTKEY | KIND_SEQUENCE
+
+# Separador dos passos de uma sequência e marcador da tecla líder do perfil
+SEQUENCE_SEPARATOR = ", "
+LEADER_TOKEN = "leader"
+
+
+class CompiledKeymap:
+    """Snapshot imutável de um perfil, pronto para o hook.
+
+    Tudo que o hook consulta por evento já vem normalizado: conjuntos são
+    frozensets e dicionários são somente leitura. Para mudar o mapeamento,
+    compila-se um novo snapshot e troca-se a referência.
+
+    `kinds` junta tudo numa só consulta por evento: nome -> bits KIND_*
+    (teclas ausentes são digitação comum). `sequences` é a raiz da trie de
+    sequências: tecla -> nó (dict) ou MacroPlan (folha).
+
+    `slot_kinds`/`slot_names` são a mesma classificação indexada pelo slot
+    (scan code) do evento, resolvida na compilação por `key_slots`: o hook
+    não faz nenhum trabalho com strings. Slots marcados com KIND_BY_NAME
+    (ambíguos, ou tudo se algum nome não foi resolvido) caem em `kinds`.
+    """
+    __slots__ = ('name', 'remaps', 'combos', 'sequences', 'mapped', 'ignored', 'activation_keys', 'kinds',
+                 'smart_typing', 'slot_kinds', 'slot_names', 'unresolved')
+
+    def __init__(self, remaps, combos, activation_keys, smart_typing, hotkey_keys=(), name=None, sequences=None,
+                 key_slots=None, shared_slots=()):
+        set_ = object.__setattr__
+        set_(self, 'name', name)
+        set_(self, 'remaps', MappingProxyType(remaps))
+        set_(self, 'combos', MappingProxyType(combos))
+        set_(self, 'sequences', MappingProxyType(sequences or {}))
+        set_(self, 'mapped', frozenset(remaps))
+        set_(self, 'activation_keys', frozenset(activation_keys))
+        set_(self, 'ignored', IGNORED_KEYS | self.activation_keys)
+
+        kinds = {}
+        for names, kind in ((MODIFIER_BITS, KIND_MODIFIER), (self.ignored, KIND_IGNORED),
+                            (self.activation_keys, KIND_ACTIVATION), (self.mapped, KIND_MAPPED),
+                            (combos, KIND_COMBO), (hotkey_keys, KIND_HOTKEY),
+                            (self.sequences, KIND_SEQUENCE)):
+            for name in names:
+                kinds[name] = kinds.get(name, 0) | kind
+        set_(self, 'kinds', MappingProxyType(kinds))
+        set_(self, 'smart_typing', bool(smart_typing))
+        slot_kinds, slot_names, unresolved = _build_slot_table(kinds, _sequence_names(self.sequences),
+                                                               key_slots, shared_slots)
+        set_(self, 'slot_kinds', slot_kinds)
+        set_(self, 'slot_names', slot_names)
+        set_(self, 'unresolved', unresolved)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledKeymap é imutável")
+
+
+def _sequence_names(trie):
+    """Todas as teclas usadas nos passos das sequências."""
+    names = set()
+    pending = [trie]
+    while pending:
+        node = pending.pop()
+        for name, child in node.items():
+            names.add(name)
+            if isinstance(child, dict):
+                pending.append(child)
+    return names
+
+
+def _build_slot_table(kinds, step_names, key_slots, shared_slots=()):
+    """Resolve os nomes em slots. Retorna (slot_kinds, slot_names, nomes não resolvidos).
+
+    Dois nomes no mesmo slot só convivem se forem apelidos sem tabela por nome
+    (ex: "ctrl" e "left ctrl"); senão o slot fica por nome. Qualquer nome não
+    resolvido deixa por nome todos os slots sem dono, para a tecla dele ainda
+    ser reconhecida pelo nome do evento.
+    """
+    if key_slots is None:
+        return array('B', [KIND_BY_NAME]) * KEY_SLOTS, (None,) * KEY_SLOTS, ()
+
+    slot_kinds = array('B', bytes(KEY_SLOTS))
+    slot_names = [None] * KEY_SLOTS
+    by_name = set(shared_slots)
+    by_name.add(NO_SLOT)
+    unresolved = []
+    for name in sorted(set(kinds) | step_names):
+        slots = key_slots(name)
+        if not slots:
+            unresolved.append(name)
+            continue
+        kind = kinds.get(name, 0)
+        for slot in slots:
+            other = slot_names[slot]
+            if other is None:
+                slot_names[slot] = name
+                slot_kinds[slot] = kind
+            elif other != name and (slot_kinds[slot] != kind or kind & NAMED_KINDS
+                                    or name in step_names or other in step_names):
+                by_name.add(slot)
+
+    if unresolved:
+        for slot, name in enumerate(slot_names):
+            if name is None:
+                by_name.add(slot)
+    for slot in by_name:
+        slot_kinds[slot] = KIND_BY_NAME
+        slot_names[slot] = None
+    return slot_kinds, tuple(slot_names), tuple(unresolved)
+
+
+def parse_combo(src):
+    """"ctrl+alt+b" -> (máscara de modificadores, "b"). Retorna None se inválida."""
+    *mods, key = [part.strip() for part in src.strip().lower().split('+')]
+    mask = 0
+    for mod in mods:
+        if mod not in MODIFIER_BITS:
+            print(f"Aviso: modificador desconhecido '{mod}' em '{src}'")
+            return None
+        mask |= MODIFIER_BITS[mod]
+    return mask, key
+
+
+def compile_hotkeys(actions):
+    """{"ctrl+alt+page down": acao} -> {"page down": {máscara: acao}}."""
+    hotkeys = {}
+    for combo, action in actions.items():
+        parsed = parse_combo(combo) if combo else None
+        if parsed:
+            mask, key = parsed
+            hotkeys.setdefault(key, {})[mask] = action
+    return hotkeys
+
+
+def _insert_sequence(trie, src, steps, plan):
+    """Insere uma sequência na trie. Retorna False se conflitar com outra."""
+    node = trie
+    for step in steps[:-1]:
+        node = node.setdefault(step, {})
+        if not isinstance(node, dict):
+            break
+    else:
+        if steps[-1] not in node:
+            node[steps[-1]] = plan
+            return True
+    print(f"Aviso: sequência '{src}' conflita com outra sequência (uma é prefixo da outra)")
+    return False
+
+
+class PlanCache:
+    """MacroPlans já compilados, por destino.
+
+    Recompilar um perfil editado reaproveita os planos dos destinos que não
+    mudaram; só os mapeamentos novos ou alterados passam por `compile_batch`.
+    """
+
+    def __init__(self, compile_batch):
+        self.compile_batch = compile_batch
+        self._plans = {}
+        self.compiled = 0   # Quantos destinos já foram realmente compilados
+
+    def get(self, dst):
+        key = dst if isinstance(dst, str) else json.dumps(dst, sort_keys=True)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = compile_macro(dst, self.compile_batch)
+            self._plans[key] = plan
+            self.compiled += 1
+        return plan
+
+
+def diff_key_maps(old, new):
+    """Origens adicionadas/alteradas e removidas entre dois key_maps."""
+    old = old or {}
+    new = new or {}
+    changed = [src for src, dst in new.items() if old.get(src) != dst]
+    removed = [src for src in old if src not in new]
+    return changed, removed
+
+
+def compile_keymap(key_map, compile_batch, activation_key=None, smart_typing=False, hotkey_keys=(), name=None,
+                   leader_key=None, plans=None, key_slots=None, shared_slots=()):
+    """Compila key_map e tecla de ativação em tabelas de consulta O(1).
+
+    Cada destino vira um MacroPlan (lotes de injeção resolvidos por `compile_batch`,
+    ou reaproveitados de `plans`, um PlanCache).
+    Origens com passos separados por ", " (ex: "leader, g, d") viram uma trie de sequências.
+    Com `key_slots` (nome -> slots do backend), as teclas também são resolvidas
+    para a tabela por scan code; nomes do perfil não resolvidos são avisados.
+    """
+    remaps = {}
+    combos = {}   # "b" -> {máscara de modificadores: MacroPlan}
+    sequences = {}
+    for src, dst in (key_map or {}).items():
+        try:
+            plan = plans.get(dst) if plans is not None else compile_macro(dst, compile_batch)
+        except ValueError as e:
+            print(f"Aviso: destino inválido para '{src}': {e}")
+            continue
+        if SEQUENCE_SEPARATOR in src:
+            steps = [step.strip().lower() for step in src.split(SEQUENCE_SEPARATOR)]
+            if LEADER_TOKEN in steps:
+                if not leader_key:
+                    print(f"Aviso: '{src}' usa a tecla líder, mas o perfil não define 'leader_key'")
+                    continue
+                steps = [leader_key if step == LEADER_TOKEN else step for step in steps]
+            _insert_sequence(sequences, src, steps, plan)
+        elif '+' in src:
+            # É uma hotkey (ex: ctrl+b)
+            parsed = parse_combo(src)
+            if parsed:
+                mask, key = parsed
+                combos.setdefault(key, {})[mask] = plan
+        else:
+            remaps[src.strip().lower()] = plan
+
+    if not activation_key:
+        activation_key = DEFAULT_ACTIVATION_KEY
+    activation_keys = {activation_key}
+
+    # Compatibilidade com ABNT2 (Alt Gr muitas vezes é identificado separado)
+    if activation_key == "right alt":
+        activation_keys.add("alt gr")
+
+    keymap = CompiledKeymap(remaps, combos, activation_keys, smart_typing, hotkey_keys, name, sequences,
+                            key_slots, shared_slots)
+    # Só avisa dos nomes escritos pelo usuário (os internos caem no nome em silêncio)
+    user_names = activation_keys | set(remaps) | set(combos) | _sequence_names(keymap.sequences)
+    missing = [key for key in keymap.unresolved if key in user_names]
+    if missing:
+        print(f"Aviso: perfil '{name}': tecla(s) não encontrada(s) no teclado, reconhecidas só pelo nome: "
+              f"{', '.join(missing)}")
+    return keymap
+
+
+class ProfileCache:
+    """Perfis do Config compilados no primeiro uso e mantidos em memória (LRU).
+
+    Trocar de perfil é só pegar outro CompiledKeymap daqui; um perfil só é
+    recompilado quando é editado (`invalidate`), reaproveitando os destinos
+    que não mudaram. Com centenas de perfis na biblioteca, só os últimos
+    `capacity` usados ficam compilados.
+
+    `get`, `store`, `prune` e `invalidate` são do motor. `compile` e `peek`
+    podem rodar em outras threads: um perfil ainda não compilado é lido e
+    compilado fora do motor e entregue com `store`, junto com o `token` do
+    momento em que a compilação começou (se o cache mudou, é descartado).
+    """
+
+    def __init__(self, config, compile_batch, hotkey_keys=(), plans=None, key_slots=None, shared_slots=(),
+                 capacity=None):
+        self.config = config
+        self.compile_batch = compile_batch
+        self.hotkey_keys = frozenset(hotkey_keys)
+        self.plans = plans if plans is not None else PlanCache(compile_batch)
+        self.key_slots = key_slots
+        self.shared_slots = shared_slots
+        self.capacity = capacity
+        self.token = object()   # Troca a cada invalidação
+        self._compiled = OrderedDict()
+
+    def peek(self, name):
+        """Perfil já compilado, ou None (não mexe na ordem do LRU)."""
+        return self._compiled.get(name)
+
+    def compile(self, name):
+        """Lê e compila o perfil, sem guardar no cache."""
+        data = self.config.get_profile_data(name)
+        return compile_keymap(
+            data.get("key_map"),
+            self.compile_batch,
+            data.get("activation_key"),
+            data.get("smart_typing"),
+            self.hotkey_keys,
+            name,
+            data.get("leader_key"),
+            self.plans,
+            self.key_slots,
+            self.shared_slots,
+        )
+
+    def get(self, name):
+        keymap = self._compiled.get(name)
+        if keymap is None:
+            keymap = self.compile(name)
+            self.store(name, keymap)
+        else:
+            self._compiled.move_to_end(name)
+        return keymap
+
+    def store(self, name, keymap, token=None):
+        """Guarda um perfil compilado. Retorna False se `token` já não vale."""
+        if token is not None and token is not self.token:
+            return False
+        self._compiled[name] = keymap
+        self._compiled.move_to_end(name)
+        if self.capacity:
+            while len(self._compiled) > self.capacity:
+                self._compiled.popitem(last=False)
+        return True
+
+    def prune(self, names):
+        """Remove do cache perfis que não existem mais."""
+        for name in list(self._compiled):
+            if name not in names:
+                del self._compiled[name]
+
+    def invalidate(self, name=None):
+        """Descarta o perfil compilado (ou todos, se name for None)."""
+        self.token = object()
+        if name is None:
+            self._compiled.clear()
+        else:
+            self._compiled.pop(name, None)
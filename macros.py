@@ -0,0 +1,155 @@
+"""Destinos de remapeamento: tecla simples, combinação, texto ou macro.
+
+Formatos aceitos no key_map (valor de cada origem):
+- "up", "ctrl+home"          tecla ou combinação (press + release)
+- "text:Olá mundo"           digita o texto
+- ["ctrl+c", {"delay": 50}, {"text": "abc"}, "enter"]
+                             macro: sequência de teclas, textos e pausas (ms)
+
+Cada destino é compilado uma vez em um MacroPlan: lotes de eventos já
+resolvidos pelo backend, cada um enviado em uma única chamada de injeção,
+separados pelas pausas. Teclas e combinações simples também ganham um
+HoldPlan, para a tecla de destino ficar pressionada enquanto a origem estiver.
+"""
+
+TEXT_PREFIX = "text:"
+
+
+class MacroError(ValueError):
+    pass
+
+
+class HoldPlan:
+    """Lotes de uma tecla/combinação segurada: pressionar, auto-repeat e soltar.
+
+    O auto-repeat repete só o KEY_DOWN da última tecla (os modificadores
+    continuam pressionados), como o próprio SO faz.
+    """
+    __slots__ = ('press', 'repeat', 'release', 'key_count')
+
+    def __init__(self, press, repeat, release, key_count):
+        self.press = press
+        self.repeat = repeat
+        self.release = release
+        self.key_count = key_count
+
+
+class MacroPlan:
+    """Plano de injeção compilado: tupla de lotes (do backend) e pausas (float, segundos).
+
+    `hold` é o HoldPlan do destino, ou None se ele não pode ser segurado
+    (texto e macros tocam inteiros a cada KEY_DOWN).
+    """
+    __slots__ = ('steps', 'has_delay', 'event_count', 'hold')
+
+    def __init__(self, steps, event_count, hold=None):
+        self.steps = tuple(steps)
+        self.has_delay = any(isinstance(step, float) for step in self.steps)
+        self.event_count = event_count
+        self.hold = hold
+
+
+def _combo_items(combo):
+    """"ctrl+home" -> press ctrl, press home, release home, release ctrl."""
+    parts = [part.strip() for part in combo.strip().lower().split('+')]
+    if not all(parts):
+        raise MacroError(f"combinação inválida: '{combo}'")
+    items = [('key', part, True) for part in parts]
+    items += [('key', part, False) for part in reversed(parts)]
+    return items
+
+
+def parse_destination(dst):
+    """Converte o destino do key_map em itens ('key', nome, down) / ('text', texto) e pausas."""
+    if isinstance(dst, str):
+        if dst.startswith(TEXT_PREFIX):
+            return [('text', dst[len(TEXT_PREFIX):])]
+        return _combo_items(dst)
+
+    if not isinstance(dst, list):
+        raise MacroError(f"destino inválido: {dst!r}")
+
+    steps = []
+    for entry in dst:
+        if isinstance(entry, str):
+            steps += _combo_items(entry)
+        elif isinstance(entry, dict) and "text" in entry:
+            steps.append(('text', str(entry["text"])))
+        elif isinstance(entry, dict) and "delay" in entry:
+            steps.append(float(entry["delay"]) / 1000.0)
+        else:
+            raise MacroError(f"passo de macro inválido: {entry!r}")
+    return steps
+
+
+def compile_macro(dst, compile_batch):
+    """Compila um destino em MacroPlan, juntando itens consecutivos em um único lote."""
+    steps = []
+    pending = []
+    event_count = 0
+    for step in parse_destination(dst):
+        if isinstance(step, float):
+            if pending:
+                steps.append(compile_batch(pending))
+                pending = []
+            if step > 0:
+                steps.append(step)
+        else:
+            pending.append(step)
+            event_count += 2 * len(step[1]) if step[0] == 'text' else 1
+    if pending:
+        steps.append(compile_batch(pending))
+    return MacroPlan(steps, event_count, compile_hold(dst, compile_batch))
+
+
+def compile_hold(dst, compile_batch):
+    """HoldPlan de uma tecla ou combinação ("up", "ctrl+z"); None para texto e macros."""
+    if not isinstance(dst, str) or dst.startswith(TEXT_PREFIX):
+        return None
+    items = _combo_items(dst)
+    count = len(items) // 2
+    return HoldPlan(compile_batch(items[:count]), compile_batch(items[count - 1:count]),
+                    compile_batch(items[count:]), count)
+
+
+def format_destination(dst):
+    """Texto curto para mostrar um destino na interface."""
+    if isinstance(dst, str):
+        return dst
+    parts = []
+    for entry in dst:
+        if isinstance(entry, dict) and "text" in entry:
+            parts.append(f'"{entry["text"]}"')
+        elif isinstance(entry, dict) and "delay" in entry:
+            parts.append(f'{entry["delay"]}ms')
+        else:
+            parts.append(str(entry))
+    return ", ".join(parts)
+
+
+class MacroPlayer:
+    """Executa MacroPlans sem bloquear o hook.
+
+    Planos sem pausa são injetados na hora (um lote = uma chamada).
+    Com pausas, cada trecho é agendado no scheduler do backend; o hook
+    segue livre enquanto a macro toca.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def play(self, plan):
+        if not plan.has_delay:
+            for batch in plan.steps:
+                self.backend.inject(batch)
+            return
+        self._play_from(plan.steps, 0)
+
+    def _play_from(self, steps, index):
+        while index < len(steps):
+            step = steps[index]
+            index += 1
+            if isinstance(step, float):
+                self.backend.scheduler.call_later(step, lambda: self._play_from(steps, index))
+                return
+            self.backend.inject(step)
@@ -1,69 +1,103 @@
+import os
+import queue
 import sys
-import tkinter as tk
-import customtkinter as ctk
 import threading
-import time
 
-from config import Config
-from utils import StartupManager
+from config import CONFIG_FILE, Config
+from profile_library import PROFILES_DIR
 from keyboard_hook import KeyboardHandler
-from gui import AppGUI
-from tray import TrayIcon
-from overlay import OverlayManager
+from state import AppState, StateStore
+from foreground import AppProfileSwitcher, WindowsForegroundProvider
+from metrics import MetricsServer
+from event_trace import TRACE_FILE
+from control import ControlServer, engine_commands, forward_to_running_instance
+from watcher import FileWatcher
+
+# customtkinter, PIL, pystray e a GUI só são importados depois que o hook de
+# teclado já está ativo (ver MainApp.start): o motor fica pronto primeiro,
+# bandeja e overlay em seguida, e a janela principal só na primeira abertura.
+
+# Intervalo (ms) em que a thread do Tkinter busca o que outras threads pediram
+UI_POLL_MS = 50
 
 class MainApp:
-    def __init__(self):
+    def __init__(self, backend=None):
+        # O canal de controle é reservado antes do hook: se duas execuções
+        # começarem juntas, só uma instala o hook de teclado
+        self.control = ControlServer()
+        if not self.control.open():
+            print("O FN Lock já está em execução (ou o canal de controle está indisponível)")
+            sys.exit(1)
         self.config = Config()
-        self.startup_manager = StartupManager()
-        
-        # Configuração global do CustomTkinter
-        ctk.set_appearance_mode("System")
-        ctk.set_default_color_theme("blue")
+        # --dump-trace=arquivo: salva o trace nesse arquivo ao sair (.jsonl ou binário)
+        self.trace_path = None
+        for arg in sys.argv[1:]:
+            if arg.startswith("--dump-trace="):
+                self.trace_path = arg.split("=", 1)[1]
         
-        # Inicializa a raiz do CustomTkinter
-        self.root = ctk.CTk()
+        # UIs criadas em start() (root, overlay, bandeja) ou sob demanda (gui)
+        self.root = None
+        self.overlay = None
+        self.tray = None
+        self.gui = None
+        # Pedidos de outras threads (motor, bandeja, canal de controle) para a
+        # thread do Tkinter: só ela chama o Tk (root.after de outra thread
+        # espera o mainloop e trava quem chamou)
+        self._ui_calls = queue.SimpleQueue()
         
-        # Overlay Manager
-        self.overlay = OverlayManager(self.root)
+        # Estado central: o teclado só atualiza o store; as UIs recebem
+        # snapshots coalescidos na thread do Tkinter.
+        self.state = StateStore(self._schedule, AppState(
+            active=self.config.get("fn_lock_active"),
+            paused=False,
+            profile=self.config.get_current_profile_name(),
+        ))
+        self.state.subscribe(self.render_state)
         
-        # Callbacks centrais
+        # Callbacks centrais (o hook fica ativo já aqui)
         self.keyboard_handler = KeyboardHandler(
             self.config, 
             on_toggle_callback=self.on_state_change_from_keyboard,
-            on_pause_callback=self.on_pause_change_from_keyboard
+            on_pause_callback=self.on_pause_change_from_keyboard,
+            backend=backend,
+            on_profile_callback=self.on_profile_change_from_keyboard
         )
         
-        self.tray = TrayIcon(
-            on_toggle_request=self.toggle_state,
-            on_open_request=self.open_gui,
-            on_quit_request=self.quit_app
-        )
+        # Troca automática de perfil pelo app em foco (regras em app_rules)
+        self.app_switcher = AppProfileSwitcher(self.config, self.keyboard_handler, WindowsForegroundProvider())
         
-        self.gui = AppGUI(
-            self.root, 
-            self.config, 
-            self.startup_manager, 
-            on_toggle_request=self.toggle_state,
-            on_quit_request=self.quit_app,
-            on_mapping_change=self.reload_mapping
-        )
-
-        # Sincroniza estado inicial
-        initial_state = self.config.get("fn_lock_active")
-        self.tray.update_state(initial_state)
-        self.update_overlay(initial_state, False)
+        # Endpoint /metrics opcional (desligado com metrics_port = 0)
+        self.metrics_server = None
+        if self.config.get("metrics_port"):
+            self.metrics_server = MetricsServer(self.keyboard_handler.metrics, self.config.get("metrics_port"))
+        
+        # Canal de controle local (outra execução do main.py repassa comandos para cá)
+        commands = engine_commands(self.keyboard_handler, self.config, self.reload_config)
+        commands["open"] = lambda: self.open_gui() or True
+        commands["quit"] = lambda: self._schedule(0, self.quit_app) or True
+        self.control.commands = commands
+        
+        # Mudanças no settings.json e em profiles/ (ex: gerenciamento de configuração) valem sem reiniciar
+        self.config_watcher = FileWatcher(CONFIG_FILE, self.reload_config, folder=PROFILES_DIR)
         
     def start(self):
-        # Inicia Tray em thread
-        self.tray.start_thread()
+        if not self.control.start():
+            print("Não foi possível abrir o canal de controle")
+        self.config_watcher.start()
+        self.app_switcher.start()
+        if self.metrics_server:
+            self.metrics_server.start()
         
         # Verifica argumentos de linha de comando para iniciar minimizado
         start_minimized = "--minimized" in sys.argv or self.config.get("start_minimized")
         
-        if start_minimized:
-            self.gui.hide_window()
-        else:
-            self.gui.show_window()
+        self._build_root(start_minimized)
+        
+        # Bandeja em thread própria (pystray/PIL são carregados lá)
+        threading.Thread(target=self._run_tray, daemon=True).start()
+        
+        if not start_minimized:
+            self._show_gui()
             
         # Inicia loop do Tkinter (Bloqueante)
         try:
@@ -71,27 +105,114 @@ class MainApp:
         except KeyboardInterrupt:
             self.quit_app()
 
+    def _build_root(self, start_minimized):
+        import customtkinter as ctk
+        from overlay import OverlayManager
+        
+        # Configuração global do CustomTkinter
+        ctk.set_appearance_mode("System")
+        ctk.set_default_color_theme("blue")
+        
+        # Inicializa a raiz do CustomTkinter (escondida até a GUI ser montada)
+        root = ctk.CTk()
+        if start_minimized:
+            root.withdraw()
+        
+        # Overlay Manager
+        self.overlay = OverlayManager(root)
+        self.root = root
+        
+        # Entrega o estado acumulado enquanto não havia UI
+        self.render_state(self.state.current)
+        root.after(0, self._pump_ui)
+
+    def _schedule(self, delay_ms, callback):
+        """Agenda na thread do Tkinter (qualquer thread, não chama o Tk nem espera).
+
+        Antes da UI existir, os pedidos só acumulam.
+        """
+        self._ui_calls.put((delay_ms, callback))
+
+    def _pump_ui(self):
+        """Thread do Tkinter: executa os pedidos das outras threads e se reagenda."""
+        while True:
+            try:
+                delay_ms, callback = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            if delay_ms > 0:
+                self.root.after(delay_ms, callback)
+                continue
+            try:
+                callback()
+            except Exception as e:
+                print(f"Erro na interface: {e}")
+        self.root.after(UI_POLL_MS, self._pump_ui)
+
+    def _run_tray(self):
+        from tray import TrayIcon
+        
+        tray = TrayIcon(
+            on_toggle_request=self.toggle_state,
+            on_open_request=self.open_gui,
+            on_quit_request=self.quit_app,
+            on_dump_trace_request=self.dump_trace
+        )
+        state = self.state.current
+        tray.update_state(state.active)
+        tray.update_paused(state.paused and state.active)
+        self.tray = tray
+        tray.run()
+
+    def _show_gui(self):
+        """Monta a janela principal na primeira vez que for aberta."""
+        if self.gui is None:
+            from gui import AppGUI
+            from utils import StartupManager
+            
+            self.gui = AppGUI(
+                self.root, 
+                self.config, 
+                StartupManager(), 
+                on_toggle_request=self.toggle_state,
+                on_quit_request=self.quit_app,
+                on_mapping_change=self.reload_mapping,
+                on_profile_change=self.change_profile,
+                metrics=self.keyboard_handler.metrics
+            )
+            self.render_state(self.state.current)
+        self.gui.show_window()
+
     def toggle_state(self, new_state):
         """Chamado pela GUI ou Tray para mudar o estado."""
         self.keyboard_handler.set_state(new_state)
-        self.update_all_uis(new_state)
 
     def on_state_change_from_keyboard(self, new_state):
         """Callback vindo do KeyboardHook (ex: Right Alt pressionado)."""
-        self.root.after(0, lambda: self.update_all_uis(new_state))
+        self.state.update(active=new_state, paused=False)
 
     def on_pause_change_from_keyboard(self, is_paused):
         """Callback quando o Smart Typing pausa/resume."""
-        is_active = self.keyboard_handler.active
-        self.root.after(0, lambda: self.update_overlay(is_active, is_paused))
-        # Atualiza Tooltip do Tray também
-        status_text = "FN Lock: PAUSADO" if is_paused else ("FN Lock: ATIVO" if is_active else "FN Lock: OFF")
-        self.tray.update_tooltip(status_text)
+        self.state.update(paused=is_paused)
+
+    def on_profile_change_from_keyboard(self, name):
+        """Callback quando o perfil muda (GUI ou atalho global de troca de perfil)."""
+        self.state.update(profile=name)
+
+    def change_profile(self, name):
+        return self.keyboard_handler.switch_profile(name)
 
-    def update_all_uis(self, is_active):
-        self.gui.update_state(is_active)
-        self.tray.update_state(is_active)
-        self.update_overlay(is_active, False)
+    def render_state(self, state):
+        """Assinante do StateStore (thread do Tkinter): aplica o snapshot às UIs."""
+        is_paused = state.paused and state.active
+        if self.gui:
+            self.gui.update_state(state.active)
+            if state.profile != self.gui.profile_var.get():
+                self.gui.update_profile(state.profile)
+        if self.tray:
+            self.tray.update_state(state.active)
+            self.tray.update_paused(is_paused)
+        self.update_overlay(state.active, is_paused)
 
     def update_overlay(self, is_active, is_paused):
         if not is_active:
@@ -105,17 +226,49 @@ class MainApp:
                 self.overlay.update_text("FN LOCK: ON", "#2ECC71") # Green
 
     def open_gui(self):
-        self.root.after(0, self.gui.show_window)
+        self._schedule(0, self._show_gui)
 
     def reload_mapping(self):
         self.keyboard_handler.update_config()
+        self.app_switcher.reload_rules()
+
+    def reload_config(self):
+        """Relê o settings.json (watcher ou comando "reload" do canal de controle)."""
+        if self.keyboard_handler.reload_config():
+            self.app_switcher.reload_rules()
+
+    def dump_trace(self, path=None):
+        """Salva o trace dos últimos eventos (menu da bandeja ou --dump-trace=arquivo)."""
+        path = path or self.trace_path or TRACE_FILE
+        if self.keyboard_handler.dump_trace(path):
+            print(f"Trace salvo em {os.path.abspath(path)}")
 
     def quit_app(self):
+        self.control.stop()
+        self.config_watcher.stop()
         self.keyboard_handler.stop()
-        self.tray.stop()
-        self.root.quit()
+        self.app_switcher.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.keyboard_handler.metrics.write_file()
+        if self.trace_path:
+            self.dump_trace()
+        self.config.flush()
+        if self.tray:
+            self.tray.stop()
+        if self.root:
+            self.root.quit()
         sys.exit(0)
 
 if __name__ == "__main__":
-    app = MainApp()
-    app.start()
+    # Já existe uma instância? Repassa o pedido a ela em vez de instalar outro hook
+    exit_code = forward_to_running_instance(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    
+    if "--daemon" in sys.argv:
+        from daemon import Daemon
+        Daemon().run()
+    else:
+        app = MainApp()
+        app.start()
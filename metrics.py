@@ -0,0 +1,165 @@
+"""Métricas do motor de teclado, no formato texto do Prometheus.
+
+Registrar é barato o bastante para ficar sempre ligado: contadores são um
+inteiro somado e histogramas usam baldes fixos pré-alocados (bisect + soma),
+sem locks e sem alocação por evento. Cada métrica é escrita por uma única
+thread (a do hook/motor); leitores (GUI, endpoint) só leem.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+METRICS_FILE = "metrics.prom"
+
+
+class Counter:
+    __slots__ = ('name', 'help', 'value')
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self):
+        return [f"{self.name} {self.value}"]
+
+
+class Histogram:
+    __slots__ = ('name', 'help', 'bounds', 'counts', 'sum', 'count')
+    kind = "histogram"
+
+    def __init__(self, name, help_text, bounds):
+        self.name = name
+        self.help = help_text
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)   # Último balde = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimativa (limite superior do balde) do quantil q."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            if total >= target:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = []
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {total}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum:.9g}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+# Baldes para tempo de callback (s): 1 µs .. 10 ms
+HOOK_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2)
+# Baldes para duração de pausa do Smart Typing (s)
+PAUSE_BUCKETS = (0.5, 1, 1.5, 2, 3, 5, 10, 30, 60)
+
+
+class EngineMetrics:
+    """Todas as métricas do KeyboardHandler."""
+
+    def __init__(self):
+        self.events_seen = Counter("fnlock_events_total", "Eventos de teclado vistos pelo hook")
+        self.events_remapped = Counter("fnlock_events_remapped_total", "Teclas físicas remapeadas")
+        self.events_suppressed = Counter("fnlock_events_suppressed_total", "Eventos suprimidos pelo hook")
+        self.synthetic_events = Counter("fnlock_synthetic_events_total", "Eventos sintéticos injetados")
+        self.pauses = Counter("fnlock_smart_typing_pauses_total", "Pausas do Smart Typing")
+        self.resumes = Counter("fnlock_smart_typing_resumes_total", "Retomadas do Smart Typing")
+        self.toggles = Counter("fnlock_toggles_total", "Vezes que o FN Lock foi ligado/desligado")
+        self.pause_seconds = Histogram(
+            "fnlock_smart_typing_pause_seconds", "Duração das pausas do Smart Typing", PAUSE_BUCKETS)
+        self.hook_seconds = Histogram(
+            "fnlock_hook_seconds", "Tempo gasto no hook por evento", HOOK_BUCKETS)
+
+    def all(self):
+        return [value for value in vars(self).values() if isinstance(value, (Counter, Histogram))]
+
+    def snapshot(self):
+        """Valores atuais em dict (para o comando "stats" do canal de controle)."""
+        values = {}
+        for name, metric in vars(self).items():
+            if isinstance(metric, Counter):
+                values[name] = metric.value
+            elif isinstance(metric, Histogram):
+                values[name] = {"count": metric.count, "sum": metric.sum,
+                                "p50": metric.quantile(0.5), "p99": metric.quantile(0.99)}
+        return values
+
+    def render_prometheus(self):
+        lines = []
+        for metric in self.all():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path=METRICS_FILE):
+        """Grava as métricas em arquivo (temporário + rename)."""
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Erro ao gravar métricas: {e}")
+            return False
+
+
+class MetricsServer:
+    """Endpoint HTTP local (127.0.0.1) que serve /metrics sob demanda."""
+
+    def __init__(self, metrics, port):
+        self.metrics = metrics
+        self.port = port
+        self.server = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        except OSError as e:
+            print(f"Erro ao abrir endpoint de métricas na porta {self.port}: {e}")
+            return
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
@@ -1,6 +1,4 @@
 import customtkinter as ctk
-import win32gui
-import win32con
 import threading
 
 class StatusOverlay:
@@ -23,56 +21,72 @@ class StatusOverlay:
     # But to keep it modular, let's define a class that takes the root.
 
 class OverlayManager:
+    WIDTH = 150
+    HEIGHT = 40
+
     def __init__(self, root):
         self.root = root
-        self.overlay = None
         self.is_active = False
-
-    def show(self):
-        if self.overlay and self.overlay.winfo_exists():
-            return
-
+        self._text = None
+        self._color = None
+        self._screen_size = None
+        
+        # A janela é criada uma vez e só mostrada/escondida (deiconify/withdraw)
         self.overlay = ctk.CTkToplevel(self.root)
+        self.overlay.withdraw()
         self.overlay.overrideredirect(True) # No title bar
         self.overlay.attributes("-topmost", True)
         self.overlay.attributes("-alpha", 0.7) # Semi-transparent
-        
-        # Position: Bottom Right
-        screen_width = self.root.winfo_screenwidth()
-        screen_height = self.root.winfo_screenheight()
-        width = 150
-        height = 40
-        x = screen_width - width - 20
-        y = screen_height - height - 60 # Above taskbar
-        
-        self.overlay.geometry(f"{width}x{height}+{x}+{y}")
         self.overlay.configure(fg_color="#1a1a1a") # Dark background
         
-        self.label = ctk.CTkLabel(self.overlay, text="FN LOCK: ON", font=("Arial", 12, "bold"), text_color="#2ECC71")
+        self.label = ctk.CTkLabel(self.overlay, text="", font=("Arial", 12, "bold"))
         self.label.pack(expand=True, fill="both")
+        self.update_text("FN LOCK: ON", "#2ECC71")
         
-        # Make click-through
+        # Make click-through (o estilo da janela persiste entre withdraw/deiconify)
         self._make_click_through()
+
+    def _update_geometry(self):
+        """Reposiciona só quando a resolução da tela muda."""
+        screen_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        if screen_size == self._screen_size:
+            return
+        self._screen_size = screen_size
         
+        # Position: Bottom Right
+        screen_width, screen_height = screen_size
+        x = screen_width - self.WIDTH - 20
+        y = screen_height - self.HEIGHT - 60 # Above taskbar
+        self.overlay.geometry(f"{self.WIDTH}x{self.HEIGHT}+{x}+{y}")
+
+    def show(self):
+        self._update_geometry()
+        if self.is_active:
+            return
+        self.overlay.deiconify()
         self.is_active = True
 
     def hide(self):
-        if self.overlay and self.overlay.winfo_exists():
-            self.overlay.destroy()
-            self.overlay = None
+        if not self.is_active:
+            return
+        self.overlay.withdraw()
         self.is_active = False
 
     def update_text(self, text, color):
-        if self.overlay and self.overlay.winfo_exists():
+        # Só reconfigura o label se algo mudou
+        if (text, color) != (self._text, self._color):
+            self._text, self._color = text, color
             self.label.configure(text=text, text_color=color)
 
     def _make_click_through(self):
-        # Allow window to render but update style to be click-through
-        self.overlay.update()
+        # Garante que a janela nativa exista antes de mudar o estilo
+        self.overlay.update_idletasks()
         hwnd = self.overlay.winfo_id() # Get HWND
         
         # Get current style
         try:
+            import win32gui
+            import win32con
             extended_style = win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
             win32gui.SetWindowLong(hwnd, win32con.GWL_EXSTYLE, extended_style | win32con.WS_EX_TRANSPARENT | win32con.WS_EX_LAYERED)
         except Exception as e:
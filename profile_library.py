@@ -0,0 +1,158 @@
+"""Biblioteca de perfis: um arquivo por perfil, carregado só quando usado.
+
+O settings.json guarda só o índice ("profile_index"): nome -> arquivo, hash
+do conteúdo e número de teclas mapeadas. O corpo de cada perfil (key_map,
+smart_typing, ...) fica em profiles/<arquivo>.json e é lido sob demanda, com
+um cache LRU dos últimos perfis usados. Gravar um perfil grava só o arquivo
+dele (e o índice, que é pequeno).
+
+A biblioteca guarda o mtime/tamanho da versão em memória de cada arquivo:
+um perfil editado fora do app é relido no recarregamento (e o índice,
+corrigido), sem precisar mexer no "hash".
+"""
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+
+PROFILES_DIR = "profiles"
+
+# Perfis mantidos em memória (os demais são relidos do disco quando usados)
+PROFILE_CACHE_SIZE = 32
+
+
+def profile_hash(body):
+    """Hash curto e estável do conteúdo de um perfil."""
+    return hashlib.sha1(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def index_entry(file, body):
+    return {"file": file, "hash": profile_hash(body), "keys": len(body.get("key_map") or {})}
+
+
+class ProfileLibrary:
+    """Corpos dos perfis em disco, com cache LRU e escrita só do que mudou.
+
+    Não tem lock próprio: o Config chama tudo com o lock dele, menos o
+    acesso ao disco (`load_file`, `read`, `signature`, `write`), que roda fora do lock.
+    """
+
+    def __init__(self, directory=PROFILES_DIR, capacity=PROFILE_CACHE_SIZE, defaults=None):
+        self.directory = directory
+        self.capacity = capacity
+        self.defaults = defaults or {}
+        self._cache = OrderedDict()   # nome -> corpo
+        self._pending = {}            # arquivo -> corpo ainda não gravado
+        self._deleted = set()         # arquivos a apagar
+        self._signatures = {}         # arquivo -> (mtime, tamanho) da versão em memória
+
+    def file_for(self, name, index):
+        """Nome de arquivo novo para o perfil (único entre os do índice).
+
+        A comparação ignora maiúsculas: no Windows "Jogos.json" e "jogos.json"
+        são o mesmo arquivo.
+        """
+        base = re.sub(r"[^\w-]", "_", name).strip("_") or "perfil"
+        used = {str(entry.get("file")).casefold() for entry in index.values()}
+        file = f"{base}.json"
+        n = 2
+        while file.casefold() in used:
+            file = f"{base}-{n}.json"
+            n += 1
+        return file
+
+    def peek(self, name, entry):
+        """Corpo do perfil se já está em memória (cache ou escrita pendente), senão None."""
+        body = self._cache.get(name)
+        if body is not None:
+            self._cache.move_to_end(name)
+            return body
+        body = self._pending.get(entry["file"])
+        if body is not None:
+            self._remember(name, body)
+        return body
+
+    def load_file(self, name, entry):
+        """Lê o perfil do disco (sem cache). Em caso de erro, avisa e usa o perfil padrão."""
+        try:
+            return self.read(entry)
+        except Exception as e:
+            print(f"Erro ao carregar o perfil '{name}': {e}")
+            return dict(self.defaults)
+
+    def read(self, entry):
+        """Lê o arquivo de um perfil (sem cache). Arquivo ausente = perfil padrão."""
+        path = os.path.join(self.directory, entry["file"])
+        if not os.path.exists(path):
+            return dict(self.defaults)
+        with open(path, "r", encoding="utf-8") as f:
+            body = json.load(f)
+        if not isinstance(body, dict):
+            raise ValueError(f"{entry['file']} não contém um objeto JSON")
+        return body
+
+    def store(self, name, entry, body):
+        """Guarda um corpo alterado; só o arquivo deste perfil será gravado."""
+        self._remember(name, body)
+        self._pending[entry["file"]] = body
+        self._deleted.discard(entry["file"])
+
+    def delete(self, name, entry):
+        self._cache.pop(name, None)
+        self._pending.pop(entry["file"], None)
+        self._deleted.add(entry["file"])
+
+    def forget(self, name, body=None):
+        """Descarta o corpo em cache (mudou no disco); `body`, se dado, já é o novo."""
+        self._cache.pop(name, None)
+        if body is not None:
+            self._remember(name, body)
+
+    def remember(self, name, body):
+        """Guarda no cache um corpo lido com load_file."""
+        self._remember(name, body)
+
+    def signature(self, file):
+        """(mtime, tamanho) do arquivo de um perfil, ou None se ele não existe."""
+        try:
+            st = os.stat(os.path.join(self.directory, file))
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def seen(self, file, signature):
+        """Marca a versão do arquivo (signature, tirada antes de lê-lo) como a que está em memória."""
+        self._signatures[file] = signature
+
+    def modified(self, file):
+        """True se o arquivo mudou no disco desde que foi lido ou gravado pelo app."""
+        return file in self._signatures and self.signature(file) != self._signatures[file]
+
+    def take_pending(self):
+        """Escritas e remoções pendentes (e limpa a lista)."""
+        pending, self._pending = self._pending, {}
+        deleted, self._deleted = self._deleted, set()
+        return pending, deleted
+
+    def write(self, file, body):
+        """Grava em arquivo temporário e renomeia (atômico)."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, file)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(body, f, indent=4, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        self._signatures[file] = self.signature(file)
+
+    def remove(self, file):
+        self._signatures.pop(file, None)
+        try:
+            os.remove(os.path.join(self.directory, file))
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, name, body):
+        self._cache[name] = body
+        self._cache.move_to_end(name)
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
@@ -0,0 +1,200 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+
+class Timer:
+    """Handle de um callback agendado. `cancel()` é O(1) (remoção preguiçosa do heap)."""
+    __slots__ = ('deadline', 'callback', 'cancelled')
+
+    def __init__(self, deadline, callback):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ManualScheduler:
+    """Heap de timers sem thread: os callbacks só rodam em `run_until`.
+
+    Usado pelo backend simulado, que avança o relógio de forma determinística.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._heap = []
+        self._counter = itertools.count()
+
+    def call_at(self, deadline, callback):
+        timer = Timer(deadline, callback)
+        self._push(timer)
+        return timer
+
+    def _push(self, timer):
+        heapq.heappush(self._heap, (timer.deadline, next(self._counter), timer))
+
+    def post(self, callback, *args):
+        """Executa uma tarefa no dono do estado. Sem thread própria: roda na hora."""
+        callback(*args)
+
+    def call(self, callback, *args):
+        """Como `post`, mas devolve o resultado."""
+        return callback(*args)
+
+    def background(self, callback, *args):
+        """Executa fora do dono do estado (ex: ler e compilar um perfil). Aqui: na hora."""
+        callback(*args)
+
+    def call_later(self, delay, callback):
+        return self.call_at(self.clock() + delay, callback)
+
+    def next_deadline(self):
+        """Deadline do próximo timer ativo (ou None)."""
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove e retorna o próximo timer vencido até `now` (ou None)."""
+        deadline = self.next_deadline()
+        if deadline is None or deadline > now:
+            return None
+        return heapq.heappop(self._heap)[2]
+
+    def run_until(self, now, set_clock=None):
+        """Executa, em ordem, todos os timers com deadline <= now.
+
+        `set_clock` permite ao dono do relógio posicioná-lo no deadline de cada
+        timer antes de executá-lo.
+        """
+        while True:
+            timer = self.pop_due(now)
+            if timer is None:
+                return
+            if set_clock:
+                set_clock(timer.deadline)
+            timer.callback()
+
+    def stop(self):
+        self._heap.clear()
+
+
+class _Reply:
+    """Resposta de uma chamada síncrona ao motor (uma por thread chamadora, reaproveitada)."""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Lock()
+        self.done.acquire()
+        self.result = None
+        self.error = None
+
+
+class Scheduler(ManualScheduler):
+    """Thread do motor: timers e tarefas vindas de outras threads rodam todos aqui, em ordem.
+
+    Outras threads só falam com ela pela fila sem lock (queue.SimpleQueue):
+    `post` enfileira e volta na hora, `call` espera o resultado. O heap de
+    timers só é tocado por esta thread. Sem timers nem tarefas, a thread fica
+    bloqueada na fila (nenhum wakeup ocioso).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__(clock)
+        self._inbox = queue.SimpleQueue()
+        self._local = threading.local()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def in_engine_thread(self):
+        return threading.get_ident() == self._thread.ident
+
+    def call_at(self, deadline, callback):
+        if self.in_engine_thread():
+            return super().call_at(deadline, callback)
+        # De outra thread: o heap é da thread do motor, que insere o timer
+        timer = Timer(deadline, callback)
+        self._inbox.put((self._push, (timer,), None))
+        return timer
+
+    def post(self, callback, *args):
+        self._inbox.put((callback, args, None))
+
+    def background(self, callback, *args):
+        """Executa numa thread à parte: I/O e compilação não seguram o motor
+        (nem o hook que estiver esperando por ele). O resultado volta com `post`."""
+        threading.Thread(target=callback, args=args, daemon=True).start()
+
+    def call(self, callback, *args):
+        if not self._running or self.in_engine_thread():
+            return callback(*args)
+        reply = getattr(self._local, 'reply', None)
+        if reply is None:
+            reply = self._local.reply = _Reply()
+        self._inbox.put((callback, args, reply))
+        reply.done.acquire()
+        result, error = reply.result, reply.error
+        reply.result = reply.error = None
+        if error is not None:
+            raise error
+        return result
+
+    def stop(self):
+        self._running = False
+        self._inbox.put((_noop, (), None))   # Acorda a thread para ela sair
+
+    def _execute(self, callback, args, reply):
+        try:
+            result = callback(*args)
+        except Exception as e:
+            if reply is None:
+                print(f"Erro na thread do motor: {e}")
+                return
+            reply.error = e
+        else:
+            if reply is not None:
+                reply.result = result
+        if reply is not None:
+            reply.done.release()
+
+    def _run(self):
+        inbox = self._inbox
+        while self._running:
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else deadline - self.clock()
+            try:
+                if timeout is None:
+                    item = inbox.get()
+                elif timeout > 0:
+                    item = inbox.get(timeout=timeout)
+                else:
+                    item = inbox.get_nowait()
+            except queue.Empty:
+                item = None
+            if item is not None:
+                self._execute(*item)
+            # Timers vencidos
+            now = self.clock()
+            while self._running:
+                timer = self.pop_due(now)
+                if timer is None:
+                    break
+                self._execute(timer.callback, (), None)
+        # Tarefas enfileiradas antes do stop (ex: limpeza final) ainda rodam,
+        # e quem espera uma resposta não fica preso para sempre
+        while True:
+            try:
+                item = inbox.get_nowait()
+            except queue.Empty:
+                break
+            self._execute(*item)
+        self._heap.clear()
+
+
+def _noop():
+    pass
@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import namedtuple
+
+AppState = namedtuple("AppState", ["active", "paused", "profile"])
+
+# Tempo mínimo (s) que um estado de pausa fica na tela antes do próximo
+MIN_DWELL = 0.3
+
+
+class StateStore:
+    """Estado central (ativo/pausado/perfil) entre o teclado e as interfaces.
+
+    O lado do teclado só chama `update`, que troca o estado pendente e, se
+    ainda não houver uma entrega agendada, agenda uma (uma por rajada).
+    A entrega roda na thread da UI via `schedule` (que não pode bloquear
+    quem chama: ex. uma fila lida pela thread da UI, ver MainApp) e manda
+    aos assinantes apenas o estado mais recente. Mudanças só de pausa
+    respeitam MIN_DWELL, para o overlay não piscar entre PAUSED e ON.
+    """
+
+    def __init__(self, schedule, initial, min_dwell=MIN_DWELL, clock=time.monotonic):
+        self.schedule = schedule
+        self.min_dwell = min_dwell
+        self.clock = clock
+        self.subscribers = []
+        self._lock = threading.Lock()
+        self._pending = initial
+        self._delivered = initial
+        self._delivered_at = 0.0
+        self._scheduled = False
+
+    @property
+    def current(self):
+        return self._pending
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def update(self, **changes):
+        """Atualiza o estado (qualquer thread, não bloqueia em UI)."""
+        with self._lock:
+            self._pending = self._pending._replace(**changes)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.schedule(0, self._deliver)
+
+    def _deliver(self):
+        """Roda na thread da UI: entrega o último estado aos assinantes."""
+        with self._lock:
+            state = self._pending
+            if state == self._delivered:
+                self._scheduled = False
+                return
+            wait = 0.0
+            if state.active == self._delivered.active and state.profile == self._delivered.profile:
+                wait = self.min_dwell - (self.clock() - self._delivered_at)
+            if wait > 0:
+                # Ainda dentro do tempo mínimo: reentrega depois, já coalescida
+                self.schedule(int(wait * 1000) + 1, self._deliver)
+                return
+            self._scheduled = False
+            self._delivered = state
+            self._delivered_at = self.clock()
+
+        for callback in self.subscribers:
+            callback(state)
@@ -0,0 +1,30 @@
+"""Origem remapeada segurada enquanto o lock ou o perfil muda (backend simulado)."""
+from benchmarks.common import MemoryConfig
+from backends import KEY_DOWN, KEY_UP, SimulatedBackend
+from keyboard_hook import KeyboardHandler
+
+
+def hold_w(change):
+    backend = SimulatedBackend()
+    config = MemoryConfig(key_map={'w': 'up'}, adaptive_smart_typing=False)
+    config.create_profile("Sem W")
+    config.set_active_profile("Sem W")
+    config.set("key_map", {'a': 'left'})
+    config.set_active_profile("Default")
+    handler = KeyboardHandler(config, backend=backend)
+    backend.feed(KEY_DOWN, 'w')
+    change(handler)
+    backend.feed(KEY_DOWN, 'w')   # Auto-repeat
+    backend.feed(KEY_UP, 'w')
+    handler.stop()
+    return backend.output
+
+
+def test_toggle_while_held_does_not_leak_the_source_key():
+    output = hold_w(lambda handler: handler.toggle())
+    assert output == [('down', 'up', True), ('down', 'up', True), ('up', 'up', True)]
+
+
+def test_switch_to_profile_without_the_key_while_held():
+    output = hold_w(lambda handler: handler.switch_profile("Sem W"))
+    assert output == [('down', 'up', True), ('down', 'up', True), ('up', 'up', True)]
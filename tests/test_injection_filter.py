@@ -0,0 +1,54 @@
+"""Filtro dos eventos que o próprio FN Lock injeta (backend simulado)."""
+from benchmarks.common import MemoryConfig
+from backends import MARKER_TTL, InjectionMarkers, SimulatedBackend
+from keyboard_hook import KeyboardHandler
+
+KEY_MAP = {'w': 'up', 'a': 'left', 's': 'down', 'd': 'right'}
+TAPS = 200
+
+
+def run(filter_injected, smart_typing=False):
+    backend = SimulatedBackend()
+    backend.filter_injected = filter_injected
+    config = MemoryConfig(key_map=KEY_MAP, smart_typing=smart_typing, adaptive_smart_typing=False)
+    handler = KeyboardHandler(config, backend=backend)
+    keys = list(KEY_MAP)
+    for i in range(TAPS):
+        backend.tap(keys[i % len(keys)])
+        backend.advance(0.05)
+    handler.stop()
+    return handler.metrics, backend
+
+
+def test_filter_halves_handler_work_per_remap():
+    unfiltered, _ = run(False)
+    filtered, _ = run(True)
+    assert unfiltered.events_remapped.value == filtered.events_remapped.value == TAPS
+    assert unfiltered.events_seen.value / unfiltered.events_remapped.value == 4
+    assert filtered.events_seen.value / filtered.events_remapped.value == 2
+
+
+def test_injected_events_still_reach_the_system():
+    _, backend = run(True)
+    injected = [event for event in backend.output if event[2]]
+    assert len(injected) == 2 * TAPS
+    assert injected[:2] == [('down', 'up', True), ('up', 'up', True)]
+    assert not backend.markers.pending
+
+
+def test_injected_keys_do_not_pause_smart_typing():
+    metrics, _ = run(True, smart_typing=True)
+    assert metrics.pauses.value == 0
+    assert metrics.events_remapped.value == TAPS
+
+
+def test_only_stale_markers_expire():
+    now = [0.0]
+    markers = InjectionMarkers(lambda: now[0])
+    markers.add([('down', 1), ('up', 1)])   # Engolidos no caminho: nunca voltam
+    now[0] += MARKER_TTL + 0.5
+    markers.add([('down', 2), ('up', 2)])
+    assert not markers.consume(('down', 3))
+    assert [code for code, _ in markers.pending] == [('down', 2), ('up', 2)]
+    assert markers.consume(('down', 2)) and markers.consume(('up', 2))
+    assert not markers.pending
@@ -0,0 +1,48 @@
+"""Recarregamento de perfis editados no disco (pasta temporária)."""
+import json
+import os
+
+from backends import SimulatedBackend
+from config import Config
+from keyboard_hook import KeyboardHandler
+
+LEGACY = {"current_profile": "Default", "fn_lock_active": True, "app_rules": {},
+          "profiles": {"Default": {"key_map": {"w": "up"}}}}
+
+
+def start(tmp_path, monkeypatch, settings=LEGACY):
+    monkeypatch.chdir(tmp_path)
+    with open("settings.json", "w") as f:
+        json.dump(settings, f)
+    config = Config()
+    backend = SimulatedBackend()
+    return config, backend, KeyboardHandler(config, backend=backend)
+
+
+def test_profile_file_edited_outside_the_app_is_reloaded(tmp_path, monkeypatch):
+    config, backend, handler = start(tmp_path, monkeypatch)
+    path = os.path.join("profiles", config.config["profile_index"]["Default"]["file"])
+    with open(path, "w") as f:
+        json.dump({"key_map": {"w": "down", "a": "left"}}, f)
+    os.utime(path, ns=(1, 1))   # mtime diferente mesmo em sistemas de arquivos com pouca resolução
+
+    assert handler.reload_config()
+    backend.tap('w')
+    handler.stop()
+    assert backend.output == [('down', 'down', True), ('up', 'down', True)]
+    assert config.config["profile_index"]["Default"]["keys"] == 2
+
+
+def test_legacy_file_equal_to_the_current_config_is_migrated_once(tmp_path, monkeypatch):
+    config, _, handler = start(tmp_path, monkeypatch)
+    legacy = {key: value for key, value in config.config.items() if key != "profile_index"}
+    legacy["profiles"] = {"Default": {"key_map": {"w": "up"}}}
+    with open("settings.json", "w") as f:
+        json.dump(legacy, f)
+
+    assert not handler.reload_config()   # Mesmo conteúdo: nada a aplicar, mas o arquivo é convertido
+    config.flush()
+    handler.stop()
+    with open("settings.json") as f:
+        assert "profile_index" in json.load(f)
+    assert not config.migrated
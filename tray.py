@@ -5,17 +5,30 @@ import threading
 import os
 import sys
 
+# Tamanho do ícone na bandeja (o PNG original é bem maior)
+ICON_SIZE = 64
+
+# Cor do indicador e tooltip de cada estado
+STATE_COLORS = {"on": "#2ECC71", "off": "#E74C3C", "paused": "#F1C40F"}
+STATE_TITLES = {"on": "FN Lock: ATIVO", "off": "FN Lock: INATIVO", "paused": "FN Lock: PAUSADO"}
+
 class TrayIcon:
-    def __init__(self, on_toggle_request, on_open_request, on_quit_request):
+    def __init__(self, on_toggle_request, on_open_request, on_quit_request, on_dump_trace_request=None):
         self.on_toggle_request = on_toggle_request
         self.on_open_request = on_open_request
         self.on_quit_request = on_quit_request
+        self.on_dump_trace_request = on_dump_trace_request
         self.icon = None
         self.is_active = False
+        self.is_paused = False
         
         # Carrega o ícone personalizado
         self.custom_icon_path = self._get_resource_path("icon.png")
         self.has_custom_icon = os.path.exists(self.custom_icon_path)
+        
+        # Decodifica o PNG uma única vez e pré-renderiza as variantes de estado;
+        # depois disso, mudar de estado é só trocar a imagem em cache.
+        self.images = self._render_images()
 
     def _get_resource_path(self, relative_path):
         """Obtém o caminho absoluto para recursos, compatível com PyInstaller."""
@@ -23,55 +36,75 @@ class TrayIcon:
             return os.path.join(sys._MEIPASS, relative_path)
         return os.path.join(os.path.abspath("."), relative_path)
 
-    def create_image(self, active):
-        """Retorna o ícone do app, com um indicador de estado se possível."""
+    def _load_base_image(self):
+        """Carrega o ícone original já reduzido para o tamanho da bandeja."""
         if self.has_custom_icon:
             try:
-                # Carrega o ícone original
-                base_img = Image.open(self.custom_icon_path).convert("RGBA")
-                
-                # Cria um indicador de estado (círculo colorido no canto)
-                width, height = base_img.size
-                indicator_size = width // 3
-                
-                # Camada para o indicador
-                overlay = Image.new('RGBA', (width, height), (0,0,0,0))
-                draw = ImageDraw.Draw(overlay)
-                
-                # Cor do estado (Verde = ON, Vermelho = OFF)
-                color = "#2ECC71" if active else "#E74C3C"
-                
-                # Desenha círculo no canto inferior direito
-                margin = 2
-                x0 = width - indicator_size - margin
-                y0 = height - indicator_size - margin
-                x1 = width - margin
-                y1 = height - margin
-                
-                draw.ellipse([x0, y0, x1, y1], fill=color, outline="white", width=1)
-                
-                # Combina
-                return Image.alpha_composite(base_img, overlay)
-                
+                with Image.open(self.custom_icon_path) as img:
+                    base_img = img.convert("RGBA")
+                base_img.thumbnail((ICON_SIZE, ICON_SIZE), Image.LANCZOS)
+                return base_img
             except Exception as e:
                 print(f"Erro ao carregar ícone personalizado: {e}")
+        return None
+
+    def _render_images(self):
+        base_img = self._load_base_image()
+        return {state: self.create_image(state, base_img) for state in STATE_COLORS}
+
+    def create_image(self, state, base_img=None):
+        """Retorna o ícone do app, com um indicador de estado se possível."""
+        color = STATE_COLORS[state]
+        
+        if base_img is not None:
+            # Cria um indicador de estado (círculo colorido no canto)
+            width, height = base_img.size
+            indicator_size = width // 3
+            
+            # Camada para o indicador
+            overlay = Image.new('RGBA', (width, height), (0,0,0,0))
+            draw = ImageDraw.Draw(overlay)
+            
+            # Desenha círculo no canto inferior direito
+            margin = 2
+            x0 = width - indicator_size - margin
+            y0 = height - indicator_size - margin
+            x1 = width - margin
+            y1 = height - margin
+            
+            draw.ellipse([x0, y0, x1, y1], fill=color, outline="white", width=1)
+            
+            # Combina
+            return Image.alpha_composite(base_img, overlay)
                 
         # Fallback para o quadrado colorido antigo
-        width = 64
-        height = 64
-        color = "#2ECC71" if active else "#E74C3C"
-        
-        image = Image.new('RGB', (width, height), color=(255, 255, 255))
+        image = Image.new('RGB', (ICON_SIZE, ICON_SIZE), color=(255, 255, 255))
         dc = ImageDraw.Draw(image)
-        dc.rectangle((0, 0, width, height), fill=color)
+        dc.rectangle((0, 0, ICON_SIZE, ICON_SIZE), fill=color)
         
         return image
 
+    def _current_state(self):
+        if not self.is_active:
+            return "off"
+        return "paused" if self.is_paused else "on"
+
+    def _refresh(self):
+        if self.icon:
+            state = self._current_state()
+            self.icon.icon = self.images[state]
+            self.icon.title = STATE_TITLES[state]
+
     def update_state(self, is_active):
         self.is_active = is_active
-        if self.icon:
-            self.icon.icon = self.create_image(is_active)
-            self.icon.title = "FN Lock: ATIVO" if is_active else "FN Lock: INATIVO"
+        self.is_paused = False
+        self._refresh()
+
+    def update_paused(self, is_paused):
+        """Mostra o ícone/tooltip de pausa do Smart Typing (imagens já em cache)."""
+        if self.is_paused != is_paused:
+            self.is_paused = is_paused
+            self._refresh()
 
     def update_tooltip(self, text):
         if self.icon:
@@ -83,6 +116,10 @@ class TrayIcon:
     def _on_open_click(self, icon, item):
         self.on_open_request()
 
+    def _on_dump_trace_click(self, icon, item):
+        if self.on_dump_trace_request:
+            self.on_dump_trace_request()
+
     def _on_quit_click(self, icon, item):
         self.on_quit_request()
 
@@ -90,15 +127,17 @@ class TrayIcon:
         return pystray.Menu(
             item('Abrir Interface', self._on_open_click, default=True),
             item(lambda text: 'Desativar FN Lock' if self.is_active else 'Ativar FN Lock', self._on_toggle_click),
+            item('Salvar Trace de Teclas', self._on_dump_trace_click, visible=self.on_dump_trace_request is not None),
             item('Sair', self._on_quit_click)
         )
 
     def run(self):
         """Inicia o ícone da bandeja (bloqueante, deve rodar em thread separada)."""
+        state = self._current_state()
         self.icon = pystray.Icon(
             "FNLock", 
-            self.create_image(self.is_active), 
-            "FN Lock: ATIVO" if self.is_active else "FN Lock: INATIVO", 
+            self.images[state], 
+            STATE_TITLES[state], 
             menu=self.setup_menu()
         )
         self.icon.run()
@@ -1,12 +1,11 @@
 import sys
 import os
-import win32com.client
 
 class StartupManager:
     def __init__(self, app_name="FNLockSimulator"):
         self.app_name = app_name
         self.shortcut_path = os.path.join(
-            os.getenv('APPDATA'), 
+            os.getenv('APPDATA', ''), 
             r'Microsoft\Windows\Start Menu\Programs\Startup', 
             f'{self.app_name}.lnk'
         )
@@ -18,6 +17,7 @@ class StartupManager:
     def register(self):
         """Cria um atalho na pasta de inicialização."""
         try:
+            import win32com.client
             shell = win32com.client.Dispatch("WScript.Shell")
             shortcut = shell.CreateShortCut(self.shortcut_path)
             # Aponta para o executável python ou o script se estiver rodando via interpretador
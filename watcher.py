@@ -0,0 +1,120 @@
+"""Observa o settings.json (e a pasta de perfis) e avisa quando algo muda no disco.
+
+No Windows usa notificações de mudança de pasta (FindFirstChangeNotification):
+a thread fica bloqueada até o sistema avisar, sem polling. Nos outros sistemas
+(ou se a notificação falhar), compara o mtime/tamanho dos arquivos a cada
+POLL_INTERVAL segundos.
+"""
+import os
+import sys
+import threading
+
+POLL_INTERVAL = 1.0
+
+# Espera (s) após uma mudança antes de avisar: editores e ferramentas de
+# gerenciamento costumam gravar o arquivo em mais de uma etapa
+SETTLE_DELAY = 0.2
+
+
+class FileWatcher:
+    """Chama `on_change` quando `path` muda. Com `folder`, também quando um
+    arquivo .json dessa pasta é criado, alterado ou apagado."""
+
+    def __init__(self, path, on_change, poll_interval=POLL_INTERVAL, folder=None):
+        self.path = os.path.abspath(path)
+        self.folder = os.path.abspath(folder) if folder else None
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._stop_handle = None
+        self._signature = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, self._folder_stat()
+
+    def _folder_stat(self):
+        if self.folder is None:
+            return None
+        files = []
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.name, st.st_mtime_ns, st.st_size))
+        except OSError:
+            pass   # Pasta ainda não criada
+        return sorted(files)
+
+    def start(self):
+        target = self._run_windows if sys.platform == "win32" else self._run_polling
+        threading.Thread(target=target, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._stop_handle:
+            import ctypes
+            ctypes.windll.kernel32.SetEvent(self._stop_handle)
+
+    def _check(self):
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return
+        # Espera o arquivo assentar e só avisa se ele parou de mudar
+        if self._stop.wait(SETTLE_DELAY):
+            return
+        if self._stat() != signature:
+            return   # Ainda mudando: a próxima notificação/verificação pega o estado final
+        self._signature = signature
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"Erro ao aplicar mudança de {os.path.basename(self.path)}: {e}")
+
+    def _run_polling(self):
+        while not self._stop.wait(self.poll_interval):
+            self._check()
+
+    def _run_windows(self):
+        import ctypes
+        from ctypes import wintypes
+
+        kernel32 = ctypes.windll.kernel32
+        kernel32.FindFirstChangeNotificationW.restype = wintypes.HANDLE
+        kernel32.CreateEventW.restype = wintypes.HANDLE
+        FILE_NOTIFY_CHANGE_FILE_NAME = 0x01
+        FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+        INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+        WAIT_OBJECT_0 = 0
+        INFINITE = 0xFFFFFFFF
+
+        # A pasta do arquivo; com `folder`, a pasta comum aos dois e as subpastas
+        directory = os.path.dirname(self.path)
+        subtree = self.folder is not None
+        if subtree:
+            directory = os.path.commonpath([directory, self.folder])
+        change = kernel32.FindFirstChangeNotificationW(
+            directory, subtree, FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_LAST_WRITE)
+        if not change or change == INVALID_HANDLE_VALUE:
+            print(f"Aviso: notificação de mudança indisponível, verificando {os.path.basename(self.path)} periodicamente")
+            self._run_polling()
+            return
+
+        self._stop_handle = kernel32.CreateEventW(None, True, False, None)
+        handles = (wintypes.HANDLE * 2)(change, self._stop_handle)
+        try:
+            while not self._stop.is_set():
+                # Acorda só quando algo muda na pasta (ou no stop)
+                if kernel32.WaitForMultipleObjects(2, handles, False, INFINITE) != WAIT_OBJECT_0:
+                    break
+                self._check()
+                if not kernel32.FindNextChangeNotification(change):
+                    break
+        finally:
+            kernel32.FindCloseChangeNotification(change)
+            kernel32.CloseHandle(self._stop_handle)
+            self._stop_handle = None